@@ -1,6 +1,6 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-from pandas.io.data import get_data_fred
+import nber
+from fred import get_data_fred
 
 ##### download data from FRED #####
 
@@ -21,12 +21,8 @@ ax.set_yticklabels([8000, 16000, 32000, 64000])
 ax.set_title("Real GDP per Person in the United States (USARGDPC)\nSource: U.S. Department of Labor, BLS (via FRED)", weight='bold')
 ax.grid()
 
-# load the NBER recession dates
-NBER_Dates = pd.read_csv('NBER Dates.txt')
-
-# for loop generates recession bands!
-for i in range(NBER_Dates.shape[0]):
-    ax.axvspan(NBER_Dates['Peak'][i], NBER_Dates['Trough'][i], facecolor='grey', alpha=0.5)
+# add NBER recession bands
+nber.shade(ax)
     
 # save the figure and display
 plt.savefig('2012-12-19-Mankiw-Figure-1-1.png')
@@ -1,11 +1,13 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-from pandas.io.data import get_data_yahoo
+import nber
+from price_store import PriceStore
 
 ##### download data from Yahoo #####
 
-# Download the S&P 500
-SP500 = get_data_yahoo('^GSPC', start='1950-01-03')
+# Download the S&P 500 (only the days since the last run are downloaded)
+store = PriceStore('^GSPC')
+store.update(start='1950-01-03')
+SP500 = store.read(start='1950-01-03')
 
 ##### plot the data #####
 
@@ -17,12 +19,8 @@ ax1.set_ylabel('Close')
 ax1.set_yscale('log')
 ax1.set_title('Historical S&P 500 Index', weight='bold')
 
-# load the NBER recession dates
-NBER_Dates = pd.read_csv('NBER Dates.txt')
-
-# for loop generates recession bands!
-for i in range(NBER_Dates.shape[0]):
-    ax1.axvspan(NBER_Dates['Peak'][i], NBER_Dates['Trough'][i], facecolor='grey', alpha=0.5)
+# add NBER recession bands
+nber.shade(ax1)
 
 # save the figure and display
 
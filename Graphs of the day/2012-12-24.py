@@ -1,14 +1,17 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
 import matplotlib as mpl
 import matplotlib.pyplot as plt
 
+import fanchart
+import kerrich
+import result_store
+
 # load the kerrich data
 kerrich_data = pd.read_csv('Kerrich.txt', header=0, index_col=0)
     
 # create an object representing a fair coin
-fair_coin = stats.distributions.bernoulli(0.5)
+fair_coin = kerrich.fair_coin
 
 ##### Difference between observed and expected heads is diverging #####
 
@@ -32,13 +35,12 @@ plt.show()
 
 ##### Checking Kerrich (single replication) #####
 
-# simulate 10000 flips of a fair coin
+# simulate 10000 flips of a fair coin (stored as packed bits)
 T = 10000
-np.random.seed(42)
-data = fair_coin.rvs((T,))
+flips = kerrich.PackedFlips.random(T, seed=42)
 
 # compute the difference between the observed and expected number of heads
-difference = np.array([ 2 * np.sum(data[:i + 1]) - (i + 1) for i in range(T) ])
+difference = flips.difference(np.arange(1, T + 1))[:, 0]
 
 # create new Figure and Axes objects
 fig = plt.figure()
@@ -63,28 +65,31 @@ plt.show()
 
 ##### N replications of the Kerrich experiment #####
 
+# independent (and reproducible) seeds for each of the experiments below
+seeds = np.random.SeedSequence(42).spawn(2)
+
+# simulations are saved to (and re-opened from) disk
+store = result_store.ResultStore('simulations')
+
 # N runs, each of length T
 N = 100
 T = 10000
 
-# generate an array of integers (each of n columns can be interpreted as a run of length T)
-data = fair_coin.rvs((T,N))
-
-# create an array in which to store the results
-difference = np.zeros(data.shape, dtype=float)
+# run the experiment (unless already on disk!)
+checkpoints = kerrich.log_checkpoints(T)
+results = kerrich.cached_run(store, T, N, fair_coin, checkpoints,
+                             seed=seeds[0])
 
-# double for loop conducts the experiment
-for j in range(N):
-    for i in range(T):
-        difference[i, j] = 2 * np.sum(data[:i + 1, j]) - (i + 1)
+# difference between observed and expected heads is 2 * Heads - n
+difference = 2 * results.total - results.n[:, np.newaxis]
 
 # create new Figure and Axes objects
 fig = plt.figure()
 ax = fig.add_subplot(111)
 
-# plot each sample path...
-for i in range(N):
-    ax.plot(np.arange(1, T + 1, 1), difference[:, i], 'k-', alpha=0.05)
+# plot quantile bands across sample paths (and a few of the paths)...
+bands = fanchart.quantile_bands(difference)
+fanchart.fan_chart(ax, results.n, bands, paths=difference, n_paths=5, seed=42)
 
 # plot Kerrich's observed difference
 kerrich_data['Difference'].plot(style='r-', label='Kerrich Data')
@@ -100,21 +105,50 @@ ax.legend(loc='best', frameon=False)
 plt.savefig('2012-12-24-Simulation-of-Differences.png')
 plt.show()
 
+##### Exact distribution of the difference (no simulation!) #####
+
+# exact quantiles of 2 * Heads - n and Heads / n at every n
+T = 10000
+n = np.arange(1, T + 1)
+exact_difference, exact_mean = kerrich.exact_envelope(n)
+
+# where does Kerrich's path fall in the exact distribution?
+print(kerrich.percentiles(kerrich_data))
+
+# create new Figure and Axes objects
+fig = plt.figure()
+ax = fig.add_subplot(111)
+
+# plot the exact quantile bands
+fanchart.fan_chart(ax, n, exact_difference)
+
+# plot Kerrich's observed difference
+kerrich_data['Difference'].plot(style='r-', label='Kerrich Data')
+
+# axes, labels, title, legend, etc.
+ax.set_xscale('log')
+ax.set_xlabel('Index')
+ax.set_ylabel('Observed heads - expected heads')
+ax.set_title("Kerrich's result was typical (exactly)!")
+ax.legend(loc='best', frameon=False)
+
+# save the figure and display!
+plt.savefig('2012-12-24-Exact-Envelope-of-Differences.png')
+plt.show()
+
 ##### Show that the LLN holds ####
 
 # set params
 N = 100
 T = 10000
 
-# generate an array of integers (each of n columns can be interpreted as a run of length T)
-data = fair_coin.rvs((T,N))
-
-# create an array in which to store our sample averages
-sample_averages = np.zeros(data.shape, dtype=float)
+# run the experiment (unless already on disk!)
+checkpoints = kerrich.log_checkpoints(T)
+results = kerrich.cached_run(store, T, N, fair_coin, checkpoints,
+                             seed=seeds[1])
 
-for j in range(N):
-    for i in range(T):
-        sample_averages[i, j] = np.mean(data[:i + 1, j])
+# sample averages for every run at each checkpoint
+sample_averages = results.mean
 
 # determine the fraction of heads in the kerrich data
 kerrich_data['Fraction Heads'] = kerrich_data['Heads'] / kerrich_data.index.values.astype('float')
@@ -123,9 +157,10 @@ kerrich_data['Fraction Heads'] = kerrich_data['Heads'] / kerrich_data.index.valu
 fig = plt.figure()
 ax = fig.add_subplot(111)
 
-# plot each sample path
-for i in range(N):
-    ax.plot(np.arange(1, T + 1, 1), sample_averages[:, i], 'k-', alpha=0.05)
+# plot quantile bands across sample paths (and a few of the paths)
+bands = fanchart.quantile_bands(sample_averages)
+fanchart.fan_chart(ax, results.n, bands, paths=sample_averages, n_paths=5,
+                   seed=42)
 
 # plot Kerrich's fraction of heads
 kerrich_data['Fraction Heads'].plot(style='r-', label=r'$\hat{\mu}_{k}$')
@@ -1,29 +1,31 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-from pandas.io.data import get_data_fred
+import nber
+from batch_fetch import fetch_all, spec
+import frequency
 
 ##### download data from FRED #####
 
-# Consumer Price Index for All Urban Consumers: All Items (Monthly, SA)
-CPIAUCSL = get_data_fred('CPIAUCSL', start='1947-01-01')
+# set to a date (e.g., '2012-12-28') to reproduce the figure with the
+# data as they were on that date
+as_of = None
 
-# Consumer Price Index for All Urban Consumers: All Items (Monthly, NSA)
-CPIAUCNS = get_data_fred('CPIAUCNS', start='1913-01-01')
-
-# Gross Domestic Product: Implicit Price Deflator (Quarterly, SA)
-GDPDEF = get_data_fred('GDPDEF', start='1947-01-01')
+# fetch all three series at once
+prices = fetch_all([
+    # Consumer Price Index for All Urban Consumers: All Items (Monthly, SA)
+    spec('fred', 'CPIAUCSL', '1947-01-01', as_of=as_of),
+    # Consumer Price Index for All Urban Consumers: All Items (Monthly, NSA)
+    spec('fred', 'CPIAUCNS', '1913-01-01', as_of=as_of),
+    # Gross Domestic Product: Implicit Price Deflator (Quarterly, SA)
+    spec('fred', 'GDPDEF', '1947-01-01', as_of=as_of)])
 
 ##### Construct measures of inflation #####
 
-# Inflation is measured as percentage change from one year ago
-Inflation_CPIAUCSL = CPIAUCSL.pct_change(periods=12)
-Inflation_CPIAUCNS = CPIAUCNS.pct_change(periods=12)
-Inflation_GDPDEF = GDPDEF.pct_change(periods=4)
-
-# Combine the three Series objects into a single DataFrame
-Inflation_Measures = Inflation_CPIAUCNS
-Inflation_Measures['CPIAUCSL'] = Inflation_CPIAUCSL
-Inflation_Measures['GDPDEF'] = Inflation_GDPDEF
+# Inflation is measured as percentage change from one year ago (computed
+# at each series' own frequency), then all three are aligned monthly
+Inflation_Measures = frequency.align([prices['CPIAUCNS'].dropna(), 
+                                      prices['CPIAUCSL'].dropna(), 
+                                      prices['GDPDEF'].dropna()], 
+                                     target='M', rule='end', transform='yoy')
 
 ##### plot the data #####
 
@@ -36,12 +38,8 @@ plt.title("Measures of historical inflation in the U.S\nSource: U.S. Department
       weight='bold')
 plt.grid()
 
-# load the NBER recession dates
-NBER_Dates = pd.read_csv('NBER Dates.txt')
-
-# for loop generates recession band!s
-for i in range(NBER_Dates.shape[0]):
-    plt.axvspan(NBER_Dates['Peak'][i], NBER_Dates['Trough'][i], facecolor='grey', alpha=0.5)
+# add NBER recession bands
+nber.shade()
     
 # save the figure and display
 plt.savefig('2012-12-28-Mankiw-Figure-1-2.png')
@@ -1,31 +1,17 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-from pandas.io.data import get_data_fred
-
-def NBER_Shade():
-    """Function adds National Bureau of Economic Research (NBER) recession
-    bands to a Matplotlib Figure object.
-
-    """
-      
-    # load the NBER recession dates
-    NBER_Dates = pd.read_csv('NBER Dates.txt')
-
-    # for loop generates recession bands!
-    for i in range(NBER_Dates.shape[0]):
-        plt.axvspan(NBER_Dates['Peak'][i], NBER_Dates['Trough'][i],
-                    facecolor='grey', alpha=0.5)
+import nber
+from batch_fetch import fetch_all, spec
 
 ##### download data from FRED #####
 
-# National Income: Compensation of Employees, Paid
-COE = get_data_fred('COE', start='1947-01-01')
-
-# Gross Domestic Product, 1 Decimal
-GDP = get_data_fred('GDP', start='1947-01-01')
+# set to a date (e.g., '2012-12-31') to reproduce the figure with the
+# data as they were on that date
+as_of = None
 
-# combine into a DataFrame
-data = pd.concat([COE, GDP], axis=1)
+# National Income: Compensation of Employees, Paid, and Gross Domestic
+# Product, 1 Decimal (fetched at the same time into a single DataFrame)
+data = fetch_all([spec('fred', 'COE', '1947-01-01', as_of=as_of), 
+                  spec('fred', 'GDP', '1947-01-01', as_of=as_of)])
 
 ##### Construct measure of labor's share #####
 
@@ -45,7 +31,7 @@ plt.title("Employee compensation share of U.S. GDP\n" +\
 plt.grid()
 
 # add NBER recession bands
-NBER_Shade()
+nber.shade()
     
 # save the figure and display
 plt.savefig('2012-12-31-Declining-COE-Share-of-GDP.png')
@@ -64,7 +50,7 @@ plt.title("Employee compensation share of U.S. GDP\n" +\
 plt.grid()
 
 # add the NBER recession bands
-NBER_Shade()
+nber.shade()
 
 # save the figure and display
 plt.savefig('2012-12-31-Krugmans-Plot.png')
@@ -84,7 +70,7 @@ plt.title("Employee compensation share of U.S. GDP\n" +\
 plt.grid()
 
 # add the NBER recession bands!
-NBER_Shade()
+nber.shade()
 
 # save the figure and display
 plt.savefig('2012-12-31-Constant-COE-Share-of-GDP.png')
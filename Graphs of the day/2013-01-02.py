@@ -1,20 +1,6 @@
-import pandas as pd
 import matplotlib.pyplot as plt
-from pandas.io.data import get_data_fred
-
-def NBER_Shade():
-    """Function adds National Bureau of Economic Research (NBER) recession
-    bands to a Matplotlib Figure object.
-
-    """
-      
-    # load the NBER recession dates
-    NBER_Dates = pd.read_csv('NBER Dates.txt')
-
-    # for loop generates recession bands!
-    for i in range(NBER_Dates.shape[0]):
-        plt.axvspan(NBER_Dates['Peak'][i], NBER_Dates['Trough'][i],
-                    facecolor='grey', alpha=0.5)
+import nber
+from fred import get_data_fred
 
 ##### download data from FRED #####
 
@@ -22,7 +8,7 @@ def NBER_Shade():
 UNRATE_monthly = get_data_fred('UNRATE', start='1948-01-01')
 
 # Convert to annual frequency by averaging across months
-UNRATE_annual = UNRATE_monthly.resample('A', how='mean')
+UNRATE_annual = UNRATE_monthly.resample('YE').mean()
 
 ##### plot the historical unemployment rate #####
 
@@ -39,7 +25,7 @@ plt.title("Civilian unemployment rate (UNRATE), Seasonally adjusted\n" +\
 plt.grid()
 
 # add NBER recession bands
-NBER_Shade()
+nber.shade()
     
 # save the figure and display
 plt.savefig('2013-01-02-Mankiw-Fig-1-3.png')
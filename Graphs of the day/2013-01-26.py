@@ -1,118 +1,12 @@
-import zipfile 
-from urllib import urlopen 
-from StringIO import StringIO 
-
 import numpy as np
-import pandas as pd
 import wbdata as wb
 import matplotlib.pyplot as plt
 import matplotlib as mpl
 
-def get_SolowResiduals(rgdppc, rgdppw, g0, delta, alpha, h=10, **kwargs):
-    """Computes Solow residuals!
-
-    Required arguments:
-
-        1. rgdppc: Must specify a valid measure of real gdp per capita. 
-           Valid options are rgdpl, rgdpl2, rgdpch. See Penn World 
-           Tables documentation for definitions of these variables.
-        2. rgdppw: Must specify a valid measure of real gdp per worker. 
-           Valid options are rgdpwok, rgdpl2wok, rgdpl2pe, rgdpl2te. 
-           See Penn World Tables documentation for definitions of 
-           these variables.
-        3. g0: Initial guess for the growth rate of technology. 
-           Required in order to pin down an initial estimate of the 
-           capital stock.
-        4. delta: Estimated rate of capital decpreciation rate. 
-           Required in order to compute the capital stock. 
-        5. alpha: Estimated share of income/output going to capital. 
-           Required in order to decompose the growth rates in order to 
-           impute A and g.
-        6. h (default=10): Must specify the amount of smoothing to be 
-           applied to computed growth rates (i.e., those of labor 
-           force, investment share, and technology). 
-
-    """
-        
-    # optional keywords args
-    path    = kwargs.get('path', None)
-    version = kwargs.get('version', 71)
-    date    = kwargs.get('date', '11302012')
-    extract = kwargs.get('extract', True)
-        
-    # first check for a local copy of PWT
-    if path != None:
-        pwt = pd.read_csv(path, index_col=['year', 'isocode'])
-
-    # otherwise, download the appropriate zip file 
-    elif path == None:
-        url = 'http://pwt.econ.upenn.edu/Downloads/pwt' + \
-              str(version) + '/pwt' + str(version) +'_' + date + \
-              'version.zip' 
-        archive = zipfile.ZipFile(StringIO(urlopen(url).read()), 'r') 
-
-        # to extract or not to extract...
-        tmp_file = 'pwt' + str(version) + \
-                   '_wo_country_names_wo_g_vars.csv'
-        if extract == True:
-            archive.extractall()
-            pwt = pd.read_csv(tmp_file, index_col=['year', 'isocode'])
-        else:
-            pwt = archive.read(tmp_file)
-            pwt = pd.read_csv(StringIO(pwt), index_col=['year', 'isocode'])         
-    
-    # convert to Pandas Panel object
-    pwt = pwt.to_panel()
-    
-    # to compute Solow residuals need to a measure of real GDP...
-    pwt['realGDP'] = pwt[rgdppc] * pwt.POP
-    
-    # ...and a measure of labor force growth rates 
-    pwt['laborForce'] = (pwt[rgdppc] / pwt[rgdppw]) * pwt.POP
-    pwt['laborForceGrowth'] = pwt.laborForce.pct_change() 
-
-    # annual growth rates are noisy, smooth them! Note backshift!
-    tmp_data = pd.rolling_mean(pwt.laborForceGrowth, 
-                               window=10, min_periods=h).shift(-h)
-    pwt['smoothedLaborForceGrowth'] = tmp_data
-    
-    # convert ki to proportion
-    pwt['investmentShare'] = pwt.ki / 100.
-    
-    # investment shares are also noisy, smooth them! Note backshift!
-    tmp_data = pd.rolling_mean(pwt.investmentShare, window=10, 
-                               min_periods=h).shift(-h)
-    pwt['smoothedInvestmentShare'] = tmp_data
-    
-    # initial data on imputed K is just made up of K0 (and junk!)
-    break_even_s = (1 + pwt.smoothedLaborForceGrowth) * (1 + g0) - (1 - delta)
-    actual_s = pwt.smoothedInvestmentShare 
-    pwt['imputedK'] = pwt.realGDP * (actual_s / break_even_s)
-    
-    # impute capital stock for each country
-    for ctry, value in pwt.imputedK.iteritems():
-        for year in pwt.imputedK.index[:-1]: # no data beyond 2010
-            if np.isnan(value.ix[year]) == False:
-                k = pwt.imputedK[ctry].ix[year]
-                s = pwt.investmentShare[ctry].ix[year]
-                y = pwt.realGDP[ctry].ix[year]
-                k_plus = (1 - delta) * k + s * y
-                pwt.imputedK[ctry].ix[year + 1] = k_plus
-            else:
-                pass
-            
-    # create capital-output ratio
-    pwt['capitalOutputRatio'] = pwt.imputedK / pwt.realGDP
-    
-    # compute the implied level of technology
-    pwt['technology'] = pwt[rgdppw] / (pwt.capitalOutputRatio**(alpha / (1 - alpha)))
-    
-    # finally, compute the growth in technology
-    pwt['technologyGrowth'] = pwt['technology'].pct_change()
+from solow import get_SolowResiduals
+import solow_stats
 
-    return pwt
-
-# Use the above function to grab the PWT data
+# Use get_SolowResiduals to grab the PWT data
 g0, delta, alpha = 0.02, 0.05, 0.33
 data = get_SolowResiduals(rgdppc='rgdpl', rgdppw='rgdpwok', 
                           g0=g0, delta=delta, alpha=alpha)
@@ -142,17 +36,19 @@ fig = plt.figure(figsize=(8,8))
 # color scheme
 colors = mpl.cm.jet(np.linspace(0, 1, 4), alpha=0.25)
 
-for ctry in data.minor_axis:
+technology = data['technology']
+
+for ctry in data.countries:
     if ctry in LIC_countries:
-        data['technology'][ctry].plot(color=colors[0], legend=False)
+        technology[ctry].plot(color=colors[0], legend=False)
     elif ctry in LMC_countries:
-        data['technology'][ctry].plot(color=colors[1], legend=False)
+        technology[ctry].plot(color=colors[1], legend=False)
     elif ctry in UMC_countries:
-        data['technology'][ctry].plot(color=colors[2], legend=False)
+        technology[ctry].plot(color=colors[2], legend=False)
     elif ctry in HIC_countries:
-        data['technology'][ctry].plot(color=colors[3], legend=False)
+        technology[ctry].plot(color=colors[3], legend=False)
     
-    val = data['technology'][ctry].ix[2010]
+    val = technology[ctry].loc[2010]
     if np.isnan(val) == False:
         plt.text(2010, val , ctry, fontsize=8)
 
@@ -165,3 +61,48 @@ plt.title(r'Technology by income group ($g_0$=%.2f, $\delta$=%.2f, $\alpha$=%.2f
 
 plt.savefig('2013-01-26-Solow-Residual-by-Income-Group.png')
 plt.show()
+
+##### Bootstrap bands for technology growth by income group #####
+groups = {'LIC':LIC_countries, 'LMC':LMC_countries, 'UMC':UMC_countries,
+          'HIC':HIC_countries}
+bands = solow_stats.bootstrap_by_year(data, groups, n=2000, seed=42)
+
+fig = plt.figure(figsize=(8,8))
+
+for i, name in enumerate(['LIC', 'LMC', 'UMC', 'HIC']):
+    if name not in bands:
+        continue
+    band = bands[name]
+    color = mpl.cm.jet(i / 3.0)
+    plt.fill_between(band.index, band[2.5], band[97.5], color=color, 
+                     alpha=0.25)
+    plt.plot(band.index, band[50], color=color, label=name)
+
+# Axes, labels, title, etc
+plt.axhline(0, color='k', linestyle='dashed')
+plt.legend(loc='best', frameon=False)
+plt.ylabel('Technology growth, g', fontsize=15)
+plt.xlabel('Year', fontsize=15)
+plt.title('Mean technology growth by income group (95% bootstrap bands)', 
+          fontsize=15)
+
+plt.savefig('2013-01-26-Technology-Growth-Bands-by-Income-Group.png')
+plt.show()
+
+# block bootstrap over years (and countries) of average growth by group
+print(solow_stats.bootstrap_period(data, groups, n=2000, block=5, seed=42))
+
+##### Convergence regressions by income group #####
+panel = get_SolowResiduals(rgdppc='rgdpl', rgdppw='rgdpwok', 
+                           g0=g0, delta=delta, alpha=alpha,
+                           outputs=('realGDP', 'laborForce', 'technology'))
+
+# every start year and window in one batched regression
+beta = solow_stats.convergence(panel, groups, starts=range(1960, 1991, 5), 
+                               windows=(10, 20), kind='beta')
+print(beta[beta.term == 'initialOutput'])
+
+# technological catch-up: technology growth on initial output per worker
+catch_up = solow_stats.convergence(panel, groups, starts=range(1960, 1991, 5),
+                                   windows=(10, 20), kind='technology')
+print(catch_up[catch_up.term == 'initialOutput'])
@@ -0,0 +1,212 @@
+"""Fetches many FRED, Yahoo! Finance and World Bank series at once.
+
+Requests are issued concurrently from a bounded pool of threads (the
+downloads spend nearly all of their time waiting on the network), with
+retries and a per-source rate limit, and the results are joined into a
+single DataFrame.
+
+"""
+import threading
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+
+import numpy as np
+import pandas as pd
+
+import fred
+
+# a single series to fetch: source is 'fred', 'yahoo' or 'worldbank'
+Spec = namedtuple('Spec', ['source', 'name', 'start', 'end', 'label',
+                           'options'])
+
+def spec(source, name, start=None, end=None, label=None, **options):
+    """Returns a Spec. Extra keyword arguments are passed on to the source
+    (e.g., column='Close' for Yahoo! or country='USA' for the World Bank).
+
+    """
+    return Spec(source, name, start, end, label, options)
+
+def _fred(s):
+    start = '1900-01-01' if s.start is None else s.start
+    return fred.get_data_fred(s.name, start, s.end, **s.options)[s.name]
+
+def _yahoo(s):
+    from pandas_datareader.data import get_data_yahoo
+    options = dict(s.options)
+    column = options.pop('column', 'Adj Close')
+    start = '1950-01-01' if s.start is None else s.start
+    return get_data_yahoo(s.name, start=start, end=s.end, **options)[column]
+
+def _worldbank(s):
+    import wbdata
+    options = dict(s.options)
+    country = options.pop('country', 'USA')
+    frame = wbdata.get_dataframe({s.name: s.name}, country=country,
+                                 convert_date=True, **options)
+    series = frame[s.name].sort_index()
+    if s.start is not None:
+        series = series[series.index >= pd.Timestamp(s.start)]
+    if s.end is not None:
+        series = series[series.index <= pd.Timestamp(s.end)]
+    return series
+
+# functions that download a Spec as a Series, by source
+sources = {'fred': _fred, 'yahoo': _yahoo, 'worldbank': _worldbank}
+
+class RateLimiter(object):
+    """Spaces out calls (from any number of threads) so that at most rate
+    of them start per second.
+
+    """
+
+    def __init__(self, rate):
+        self.interval = 0 if rate is None else 1 / rate
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            start = max(now, self.next_time)
+            self.next_time = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def _key(s):
+    """Identifies duplicate specs (which are only fetched once)."""
+    return (s.source, s.name, s.start, s.end, sorted(s.options.items()))
+
+def _label(s):
+    if s.label is not None:
+        return s.label
+    if 'country' in s.options:
+        return '%s (%s)' % (s.name, s.options['country'])
+    return s.name
+
+def fetch(s, retries=3, backoff=0.5, limiter=None):
+    """Fetches a single Spec, retrying network errors (with exponential
+    backoff) up to retries times.
+
+    """
+    for attempt in range(retries + 1):
+        if limiter is not None:
+            limiter.wait()
+        try:
+            return sources[s.source](s)
+        except IOError:
+            if attempt == retries:
+                raise
+            time.sleep(backoff * 2**attempt)
+
+def fetch_all(specs, processes=8, retries=3, backoff=0.5, rate=None,
+              join='outer'):
+    """Fetches a list of series concurrently.
+
+    Required arguments:
+
+        1. specs: Sequence of Specs (see spec), or (source, name) pairs.
+
+    Optional arguments:
+
+        1. processes (default=8): Number of threads (i.e., the most
+           requests in flight at once).
+        2. retries (default=3): Number of retries per series.
+        3. backoff (default=0.5): Seconds to wait before the first retry
+           (doubling for each later one).
+        4. rate (default=None): Most requests per second to any one
+           source, or a dictionary of them by source. None is unlimited.
+        5. join (default='outer'): How to align the series' dates.
+
+    Returns a DataFrame with one column per spec (labelled by the spec's
+    label or name) indexed by date.
+
+    """
+    specs = [s if isinstance(s, Spec) else spec(*s) for s in specs]
+    if not isinstance(rate, dict):
+        rate = dict((source, rate) for source in sources)
+    limiters = dict((source, RateLimiter(rate.get(source)))
+                    for source in sources)
+
+    unique = []
+    for s in specs:
+        if _key(s) not in [_key(u) for u in unique]:
+            unique.append(s)
+
+    def work(s):
+        return fetch(s, retries, backoff, limiters[s.source])
+
+    pool = ThreadPool(max(1, min(processes, len(unique))))
+    try:
+        results = pool.map(work, unique)
+    finally:
+        pool.close()
+        pool.join()
+
+    keys = [_key(u) for u in unique]
+    columns = [results[keys.index(_key(s))].rename(_label(s)) for s in specs]
+    return pd.concat(columns, axis=1, join=join)
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+def stub_server(latency=0.2, observations=600, port=0):
+    """Starts a local stand-in for FRED that serves a synthetic monthly
+    CSV for any series after sleeping for latency seconds. Returns the
+    server (call shutdown() when done) and its base URL for fred.
+
+    """
+    dates = pd.date_range('1960-01-01', periods=observations, freq='MS')
+    values = np.cumsum(np.random.RandomState(0).randn(observations)) + 100
+    body = 'DATE,VALUE\n' + ''.join('%s,%.3f\n' % (d.date(), v)
+                                    for d, v in zip(dates, values))
+    body = body.encode('utf-8')
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/csv')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = _ThreadingHTTPServer(('127.0.0.1', port), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:%d' % server.server_address[1]
+
+def benchmark(names, cache, latency=0.2, processes=8):
+    """Times fetching FRED series names one after the other and with
+    fetch_all from a stub_server with the given latency. The cache
+    directory is bypassed (refresh=True) so that every series is
+    downloaded each time.
+
+    Returns a dictionary of wall-clock seconds for 'serial' and
+    'concurrent'.
+
+    """
+    server, url = stub_server(latency)
+    try:
+        specs = [spec('fred', name, url=url, cache=cache, refresh=True)
+                 for name in names]
+
+        start = time.time()
+        for s in specs:
+            fetch(s)
+        serial = time.time() - start
+
+        start = time.time()
+        fetch_all(specs, processes)
+        concurrent = time.time() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    return {'serial': serial, 'concurrent': concurrent}
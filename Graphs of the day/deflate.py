@@ -0,0 +1,78 @@
+"""Converts nominal price series into real prices using a price index
+(e.g., CPIAUCSL from FRED).
+
+"""
+import numpy as np
+import pandas as pd
+
+import frequency
+
+def _period_ends(dates, freq):
+    """First instant after the period (of frequency freq) that starts at
+    each date.
+
+    """
+    months = {'M': 1, 'Q': 3, 'A': 12}
+    if freq in months:
+        ends = dates.astype('datetime64[M]') + months[freq]
+        return ends.astype(dates.dtype)
+    days = {'D': 1, 'W': 7}[freq]
+    return dates + np.timedelta64(days, 'D').astype(dates.dtype)
+
+def _lookup(dates, ends, when):
+    """Position of the index period containing each of when (-1 if none)."""
+    pos = np.searchsorted(dates, when, side='right') - 1
+    inside = (pos >= 0) & (when < ends[np.maximum(pos, 0)])
+    return np.where(inside, pos, -1)
+
+def deflate(prices, index, base, columns=None, name='CPI'):
+    """Expresses prices in terms of the price level in period base.
+
+    Each date of prices takes the value of the price index in the period
+    containing it (e.g., the month for a monthly index), so daily or
+    monthly prices can be deflated by a monthly index without resampling.
+    Dates outside every period of the index (e.g., after the latest
+    month) are NaN.
+
+    Required arguments:
+
+        1. prices: DataFrame (or Series) of nominal prices indexed by date.
+        2. index: Series (or single column DataFrame) of the price index.
+        3. base: Date of the base period (e.g., '2012-11-01').
+
+    Optional arguments:
+
+        1. columns (default=None): Columns of prices to deflate. Default
+           is all of them.
+        2. name (default='CPI'): Name of the price index column.
+
+    Returns a copy of prices with extra columns name, 'Price Deflator'
+    and '<column> (Real)' for each deflated column.
+
+    """
+    if isinstance(prices, pd.Series):
+        prices = prices.to_frame()
+    if isinstance(index, pd.DataFrame):
+        index = index[index.columns[0]]
+    columns = list(prices.columns) if columns is None else list(columns)
+
+    # period of the index containing each date of prices
+    dates = index.index.values
+    ends = _period_ends(dates, frequency.infer_frequency(index.index))
+    level = index.values.astype(np.float64)
+    pos = _lookup(dates, ends, prices.index.values)
+    aligned = np.where(pos >= 0, level[np.maximum(pos, 0)], np.nan)
+
+    base_pos = _lookup(dates, ends,
+                       np.array([pd.Timestamp(base).to_datetime64()]))[0]
+    if base_pos < 0:
+        raise ValueError('No price index observation for %s!' % base)
+    deflator = level[base_pos] / aligned
+
+    result = prices.copy()
+    result[name] = aligned
+    result['Price Deflator'] = deflator
+    real = prices[columns].values * deflator[:, np.newaxis]
+    for i, column in enumerate(columns):
+        result[column + ' (Real)'] = real[:, i]
+    return result
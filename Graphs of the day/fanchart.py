@@ -0,0 +1,144 @@
+"""Quantile fan charts for summarizing many Monte Carlo sample paths.
+
+"""
+import numpy as np
+
+# quantiles drawn by default (symmetric pairs become filled bands)
+quantiles = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+def quantile_bands(paths, q=quantiles):
+    """Computes exact quantiles across replications at every index.
+
+    Required arguments:
+
+        1. paths: (T, N) array. Each column is a sample path.
+
+    Optional arguments:
+
+        1. q (default=quantiles): Sequence of quantiles in [0, 1].
+
+    Returns an array of shape (len(q), T).
+
+    """
+    return np.percentile(paths, 100 * np.asarray(q), axis=1)
+
+class QuantileSketch(object):
+    """Streaming (histogram) sketch of the cross-sectional distribution of
+    sample paths at each of T indices. Sample paths can be added in
+    batches (and sketches from different shards merged), so the full
+    T x N matrix is never needed. Quantiles are accurate to within one
+    bin width.
+
+    """
+
+    def __init__(self, lower, upper, bins=256):
+        """Required arguments:
+
+            1. lower: Scalar or (T,) array of lower bounds on the paths.
+            2. upper: Scalar or (T,) array of upper bounds on the paths.
+
+        Optional arguments:
+
+            1. bins (default=256): Number of histogram bins per index.
+
+        Values outside [lower, upper] are counted in the end bins.
+
+        """
+        self.lower = np.atleast_1d(np.asarray(lower, dtype=float))
+        self.upper = np.atleast_1d(np.asarray(upper, dtype=float))
+        self.bins = bins
+        self.width = (self.upper - self.lower) / bins
+        self.counts = None
+
+    def update(self, paths):
+        """Adds a (T, N) batch of sample paths to the sketch."""
+        paths = np.asarray(paths, dtype=float)
+        T = paths.shape[0]
+        if self.counts is None:
+            self.counts = np.zeros((T, self.bins), dtype=np.int64)
+
+        # bin index of every value, clipped into the end bins
+        idx = np.floor((paths - self.lower[:, np.newaxis]) /
+                       self.width[:, np.newaxis]).astype(np.int64)
+        np.clip(idx, 0, self.bins - 1, out=idx)
+
+        # one bincount over flattened (index, bin) pairs
+        flat = idx + self.bins * np.arange(T)[:, np.newaxis]
+        self.counts += np.bincount(flat.ravel(), minlength=T * self.bins
+                                   ).reshape(T, self.bins)
+        return self
+
+    def merge(self, other):
+        """Adds the counts of another sketch with the same bins."""
+        if self.counts is None:
+            self.counts = other.counts.copy()
+        elif other.counts is not None:
+            self.counts += other.counts
+        return self
+
+    def quantile_bands(self, q=quantiles):
+        """Returns an array of shape (len(q), T) of approximate quantiles,
+        interpolating linearly within bins.
+
+        """
+        cdf = np.cumsum(self.counts, axis=1)
+        total = cdf[:, -1].astype(float)
+        rows = np.arange(cdf.shape[0])
+
+        bands = np.empty((len(q), cdf.shape[0]))
+        for i, quantile in enumerate(q):
+            target = quantile * total
+
+            # first bin at which the cdf reaches the target
+            j = np.argmax(cdf >= target[:, np.newaxis], axis=1)
+            below = np.where(j > 0, cdf[rows, j - 1], 0)
+            inside = self.counts[rows, j]
+            frac = np.where(inside > 0, (target - below) / np.maximum(inside, 1),
+                            0.5)
+            bands[i] = self.lower + (j + frac) * self.width
+
+        return bands
+
+def fan_chart(ax, x, bands, q=quantiles, color='k', paths=None, n_paths=0,
+              seed=None, label=None):
+    """Draws quantile bands as a handful of filled regions, so that render
+    cost does not depend on the number of replications.
+
+    Required arguments:
+
+        1. ax: Matplotlib Axes object.
+        2. x: (T,) array of indices.
+        3. bands: (len(q), T) array of quantiles (see quantile_bands).
+
+    Optional arguments:
+
+        1. q (default=quantiles): Quantiles corresponding to the rows of
+           bands. Symmetric pairs (first and last, second and second to
+           last, etc) are filled; a middle quantile is drawn as a line.
+        2. color (default='k'): Color of the bands and lines.
+        3. paths (default=None): (T, N) array of raw sample paths.
+        4. n_paths (default=0): Number of randomly chosen raw sample
+           paths to overlay (requires paths).
+        5. seed (default=None): Seed used to choose the raw sample paths.
+        6. label (default=None): Legend label for the median.
+
+    """
+    k = len(q)
+    for i in range(k // 2):
+        # inner bands are darker
+        alpha = 0.15 + 0.45 * i / max(k // 2 - 1, 1)
+        ax.fill_between(x, bands[i], bands[k - 1 - i], color=color,
+                        alpha=alpha, linewidth=0,
+                        label='%g-%g%%' % (100 * q[i], 100 * q[k - 1 - i]))
+
+    if k % 2 == 1:
+        ax.plot(x, bands[k // 2], color=color, linestyle='-', label=label)
+
+    if paths is not None and n_paths > 0:
+        prng = np.random.RandomState(seed)
+        cols = prng.choice(paths.shape[1], min(n_paths, paths.shape[1]),
+                           replace=False)
+        ax.plot(x, paths[:, cols], color=color, linestyle='-', alpha=0.25,
+                linewidth=0.5)
+
+    return ax
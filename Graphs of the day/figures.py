@@ -0,0 +1,63 @@
+"""Renders several variants of the same figure (e.g., nominal vs real,
+linear vs log-scale) from one dataset and one set of axes.
+
+"""
+from collections import namedtuple
+
+import matplotlib.pyplot as plt
+
+# a single variant: which column to plot, on which y-scale and where to
+# save it
+Variant = namedtuple('Variant', ['column', 'yscale', 'ylabel', 'filename'])
+
+def render_variants(data, variants, title=None, decorate=None, figsize=None,
+                    show=True, **kwargs):
+    """Draws each variant on one shared axes template and saves it.
+
+    The figure, title and any decorations (e.g., recession bands) are
+    drawn once (decorations after the first variant's line, so that the
+    x-axis has its units and limits); each variant only swaps in its own
+    line, y-scale and y-label before being saved.
+
+    Required arguments:
+
+        1. data: DataFrame indexed by date.
+        2. variants: Sequence of Variants.
+
+    Optional arguments:
+
+        1. title (default=None): Title of every variant.
+        2. decorate (default=None): Function of an Axes that adds
+           anything common to all variants.
+        3. figsize (default=None): Size of the figure.
+        4. show (default=True): Whether to display the figure once all
+           variants are saved.
+        5. Any other keyword arguments are passed to Axes.plot.
+
+    Returns the Figure.
+
+    """
+    fig, ax = plt.subplots(figsize=figsize)
+    if title is not None:
+        ax.set_title(title, weight='bold')
+
+    line = None
+    for i, variant in enumerate(variants):
+        if line is not None:
+            line.remove()
+        line, = ax.plot(data.index.to_pydatetime(),
+                        data[variant.column].values, **kwargs)
+
+        ax.set_yscale(variant.yscale)
+        ax.set_ylabel(variant.ylabel)
+        ax.relim()
+        ax.autoscale_view()
+
+        # decorations need the x-axis units and limits of the data
+        if i == 0 and decorate is not None:
+            decorate(ax)
+        fig.savefig(variant.filename)
+
+    if show == True:
+        plt.show()
+    return fig
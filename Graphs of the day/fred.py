@@ -0,0 +1,197 @@
+"""Local cache of FRED series shared by all of the scripts.
+
+Each series is downloaded in full once and stored in the cache directory
+as a compact binary file (int32 day numbers and float64 values) next to
+a JSON file of metadata (first and last observation, fetch time and the
+server's Last-Modified header). Requests for any date range are sliced
+out of the cached series, which is only re-downloaded once it is older
+than the time-to-live (and even then only if the server has a newer
+version). Every download is also recorded in a vintage store (see
+vintages), so that series can be requested as they were on a past date.
+
+"""
+import json
+import os
+import tempfile
+import time
+from io import BytesIO
+from urllib.error import HTTPError
+from urllib.request import urlopen, Request
+
+import numpy as np
+import pandas as pd
+
+import vintages
+
+# default location of the cache (override with the FRED_CACHE variable)
+cache_dir = os.environ.get('FRED_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.fred_cache'))
+
+# where series are downloaded from (override with the FRED_URL variable,
+# e.g., to point at a local test server)
+base_url = os.environ.get('FRED_URL',
+                          'http://research.stlouisfed.org/fred2/series')
+
+# default time-to-live of cached series (in seconds)
+ttl = 24 * 60 * 60
+
+def series_url(name, url=None):
+    """Download URL of the CSV file for series name."""
+    url = base_url if url is None else url
+    return url.rstrip('/') + '/' + name + '/downloaddata/' + name + '.csv'
+
+def parse(data, name):
+    """Parses the bytes of a FRED CSV into a DataFrame indexed by DATE."""
+    frame = pd.read_csv(BytesIO(data), index_col=0, parse_dates=True,
+                        na_values='.')
+    frame.index.name = 'DATE'
+    frame.columns = [name]
+    return frame.astype(np.float64)
+
+def _paths(name, cache):
+    cache = cache_dir if cache is None else cache
+    return (os.path.join(cache, name + '.npz'),
+            os.path.join(cache, name + '.json'))
+
+def metadata(name, cache=None):
+    """Metadata of the cached copy of series name (None if not cached)."""
+    meta_path = _paths(name, cache)[1]
+    if not os.path.isfile(meta_path):
+        return None
+    with open(meta_path) as f:
+        return json.load(f)
+
+def _write(path, write):
+    """Writes path atomically with write(file object)."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def store(frame, name, cache=None, last_modified=None):
+    """Writes a (single column) DataFrame to the cache as series name."""
+    data_path, meta_path = _paths(name, cache)
+    # exist_ok, as several threads (see batch_fetch) may race here
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+    days = frame.index.values.astype('datetime64[D]').astype(np.int32)
+    values = frame[frame.columns[0]].values.astype(np.float64)
+    _write(data_path, lambda f: np.savez(f, days=days, values=values))
+
+    meta = {'series': name, 'observations': len(frame),
+            'first': str(frame.index[0].date()) if len(frame) else None,
+            'last': str(frame.index[-1].date()) if len(frame) else None,
+            'fetched': time.time(), 'last_modified': last_modified}
+    _write(meta_path,
+           lambda f: f.write(json.dumps(meta, indent=2).encode('utf-8')))
+    return meta
+
+def _touch(name, cache):
+    """Marks the cached copy of series name as freshly fetched."""
+    meta = metadata(name, cache)
+    meta['fetched'] = time.time()
+    _write(_paths(name, cache)[1],
+           lambda f: f.write(json.dumps(meta, indent=2).encode('utf-8')))
+
+def vintage_store(cache=None):
+    """VintageStore of every version of the series downloaded to cache."""
+    cache = cache_dir if cache is None else cache
+    return vintages.VintageStore(os.path.join(cache, 'vintages'))
+
+def read(name, cache=None):
+    """Reads the cached copy of series name as a DataFrame."""
+    with np.load(_paths(name, cache)[0]) as arrays:
+        index = pd.DatetimeIndex(arrays['days'].astype('datetime64[D]'),
+                                 name='DATE')
+        return pd.DataFrame({name: arrays['values']}, index=index)
+
+def fetch(name, cache=None, url=None):
+    """Downloads series name into the cache, unless the server says that
+    the cached copy is still current. Returns the cache metadata.
+
+    """
+    meta = metadata(name, cache)
+    request = Request(series_url(name, url))
+    if meta is not None and meta.get('last_modified'):
+        request.add_header('If-Modified-Since', meta['last_modified'])
+
+    try:
+        response = urlopen(request)
+    except HTTPError as err:
+        if err.code == 304: # not modified
+            _touch(name, cache)
+            return metadata(name, cache)
+        raise
+
+    frame = parse(response.read(), name)
+    meta = store(frame, name, cache, response.headers.get('Last-Modified'))
+    vintage_store(cache).record(name, frame, meta['fetched'])
+    return meta
+
+def is_stale(meta, max_age=None, end=None):
+    """Whether cached series (with metadata meta) needs refreshing, i.e.,
+    it is older than max_age seconds and (if end is given) does not yet
+    reach end.
+
+    """
+    max_age = ttl if max_age is None else max_age
+    if meta is None:
+        return True
+    if end is not None and meta['last'] is not None and \
+       pd.Timestamp(meta['last']) >= pd.Timestamp(end):
+        return False
+    return time.time() - meta['fetched'] > max_age
+
+def get_data_fred(name, start='2010-01-01', end=None, cache=None,
+                  max_age=None, refresh=False, url=None, as_of=None):
+    """Drop-in replacement for pandas.io.data.get_data_fred that serves
+    series from the local cache.
+
+    Required arguments:
+
+        1. name: FRED series ID (e.g., 'CPIAUCSL').
+
+    Optional arguments:
+
+        1. start (default='2010-01-01'): First date to return (the
+           same default as pandas.io.data).
+        2. end (default=None): Last date to return. Default is today.
+        3. cache (default=None): Cache directory. Default is cache_dir.
+        4. max_age (default=None): Time-to-live of the cached copy in
+           seconds. Default is ttl.
+        5. refresh (default=False): Whether to check the server even if
+           the cached copy is fresh.
+        6. url (default=None): Base URL to download from. Default is
+           base_url.
+        7. as_of (default=None): Date. If given, returns the series as
+           it was downloaded on or before that date (see vintages)
+           rather than the latest version.
+
+    Returns a DataFrame with one column, name, indexed by DATE.
+
+    """
+    meta = metadata(name, cache)
+    if as_of is not None:
+        history = vintage_store(cache)
+        if meta is None:
+            fetch(name, cache, url)
+        elif not history.index(name)['times']:
+            # cached before vintages were kept
+            history.record(name, read(name, cache), meta['fetched'])
+        frame = history.as_of(name, as_of)
+    else:
+        if refresh == True or is_stale(meta, max_age, end):
+            fetch(name, cache, url)
+        frame = read(name, cache)
+
+    keep = frame.index >= pd.Timestamp(start)
+    if end is not None:
+        keep &= frame.index <= pd.Timestamp(end)
+    return frame[keep]
@@ -0,0 +1,128 @@
+"""Aligns time series observed at different frequencies (e.g., monthly CPI
+and quarterly GDP deflator) on a common target frequency.
+
+Every series is transformed at its own (native) frequency first, and then
+placed on the target grid of periods by a declared rule, all in one pass
+of index arithmetic per series.
+
+"""
+import numpy as np
+import pandas as pd
+
+# number of periods in a year, by frequency
+periods_per_year = {'A': 1, 'Q': 4, 'M': 12, 'W': 52, 'D': 365}
+
+# months in a period of the target frequencies
+_months = {'A': 12, 'Q': 3, 'M': 1}
+
+def infer_frequency(index):
+    """Native frequency ('D', 'W', 'M', 'Q' or 'A') of a DatetimeIndex,
+    from the median gap between observations.
+
+    """
+    days = np.asarray(index.values, dtype='datetime64[D]').astype(np.int64)
+    if days.size < 2:
+        raise ValueError('Need at least two observations to infer frequency!')
+    gap = np.median(np.diff(days))
+    if gap < 4:
+        return 'D'
+    elif gap < 20:
+        return 'W'
+    elif gap < 60:
+        return 'M'
+    elif gap < 200:
+        return 'Q'
+    else:
+        return 'A'
+
+def yoy(series, freq=None):
+    """Percentage change from a year ago, computed at the native frequency
+    of series (e.g., 12 periods for monthly data, 4 for quarterly).
+
+    """
+    freq = infer_frequency(series.index) if freq is None else freq
+    return series.pct_change(periods=periods_per_year[freq])
+
+def _periods(index, target):
+    """Number of each date's target period (months, quarters or years
+    since 1970).
+
+    """
+    months = np.asarray(index.values, dtype='datetime64[M]').astype(np.int64)
+    return months // _months[target]
+
+def _start(periods, target):
+    """First day of each target period."""
+    months = (periods * _months[target]).astype('datetime64[M]')
+    return pd.DatetimeIndex(months.astype('datetime64[ns]'))
+
+def _place(values, pos, size, rule):
+    """Puts values at positions pos of a grid of size periods by rule."""
+    out = np.empty(size)
+    out.fill(np.nan)
+    valid = ~np.isnan(values)
+    values, pos = values[valid], pos[valid]
+
+    if rule == 'mean':
+        counts = np.bincount(pos, minlength=size)
+        sums = np.bincount(pos, weights=values, minlength=size)
+        with np.errstate(invalid='ignore'):
+            out[counts > 0] = sums[counts > 0] / counts[counts > 0]
+    elif rule in ('end', 'ffill'):
+        # later observations overwrite earlier ones in the same period
+        out[pos] = values
+        if rule == 'ffill':
+            filled = np.where(~np.isnan(out), np.arange(size), -1)
+            np.maximum.accumulate(filled, out=filled)
+            out = np.where(filled >= 0, out[np.maximum(filled, 0)], np.nan)
+    else:
+        raise ValueError("rule must be 'end', 'mean' or 'ffill'!")
+    return out
+
+def align(series, target='M', rule='end', transform=None):
+    """Aligns any number of series on a common target frequency.
+
+    Required arguments:
+
+        1. series: Sequence of named Series (or single column DataFrames,
+           e.g., from fred.get_data_fred), or a dictionary of Series.
+
+    Optional arguments:
+
+        1. target (default='M'): Target frequency, 'M', 'Q' or 'A'.
+        2. rule (default='end'): How to place each series on the target
+           periods, either one rule or a dictionary of rules by name:
+           'end' takes the last observation in each period, 'mean' the
+           average of the observations in each period and 'ffill' the
+           last observation on or before each period.
+        3. transform (default=None): Either None or 'yoy' (see yoy),
+           applied at each series' native frequency before aligning.
+
+    Returns a DataFrame indexed by the first day of each target period,
+    with one column per series.
+
+    """
+    if target not in _months:
+        raise ValueError("target must be 'M', 'Q' or 'A'!")
+    if isinstance(series, dict):
+        series = [series[name].rename(name) for name in sorted(series)]
+    series = [s[s.columns[0]] if isinstance(s, pd.DataFrame) else s
+              for s in series]
+
+    if transform == 'yoy':
+        series = [yoy(s) for s in series]
+    elif transform is not None:
+        raise ValueError("transform must be None or 'yoy'!")
+
+    periods = [_periods(s.index, target) for s in series]
+    first = min(p.min() for p in periods)
+    last = max(p.max() for p in periods)
+    size = last - first + 1
+
+    data = np.empty((size, len(series)))
+    for i, (s, p) in enumerate(zip(series, periods)):
+        r = rule.get(s.name, 'end') if isinstance(rule, dict) else rule
+        data[:, i] = _place(s.values.astype(np.float64), p - first, size, r)
+
+    index = _start(np.arange(first, last + 1), target)
+    return pd.DataFrame(data, index=index, columns=[s.name for s in series])
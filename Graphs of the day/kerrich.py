@@ -0,0 +1,568 @@
+"""Simulation engine for replications of Kerrich's coin flipping experiment.
+
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+import fanchart
+import pools
+
+# an object representing a fair coin
+fair_coin = stats.distributions.bernoulli(0.5)
+
+# summary statistics of N replications after the first n draws
+Checkpoint = namedtuple('Checkpoint', ['n', 'total', 'mean', 'var', 'zscore'])
+
+def _tosses(T, ndim, dtype):
+    """Returns the number of tosses 1, 2, ..., T shaped so that it will
+    broadcast against a (T, N, ...) array of paths.
+
+    """
+    shape = (T,) + (1,) * (ndim - 1)
+    return np.arange(1, T + 1, dtype=dtype).reshape(shape)
+
+def heads_paths(data, dtype=np.int32):
+    """Running count of heads along the first axis of data.
+
+    Required arguments:
+
+        1. data: (T,) or (T, N) array of coin flips (1=heads, 0=tails).
+           Each column is interpreted as a run of length T.
+
+    Optional arguments:
+
+        1. dtype (default=np.int32): Integer type used to store the
+           counts. int32 is exact for runs of up to 2**31 - 1 flips.
+
+    """
+    return np.cumsum(data, axis=0, dtype=dtype)
+
+def difference_paths(data, dtype=np.int32, heads=None):
+    """Difference between observed and expected number of heads, i.e.
+    2 * Heads - n, for every n along the first axis of data.
+
+    Required arguments:
+
+        1. data: (T,) or (T, N) array of coin flips.
+
+    Optional arguments:
+
+        1. dtype (default=np.int32): Signed integer type of the output.
+        2. heads (default=None): Precomputed output of heads_paths. If
+           given (and of the requested dtype) it is overwritten in place.
+
+    """
+    if heads is None:
+        heads = heads_paths(data, dtype)
+    elif heads.dtype != dtype:
+        heads = heads.astype(dtype)
+
+    # 2 * Heads - n computed in place, no temporaries of size T x N
+    heads *= 2
+    heads -= _tosses(heads.shape[0], heads.ndim, dtype)
+    return heads
+
+def sample_average_paths(data, dtype=np.float32, heads=None):
+    """Running sample average (i.e., fraction of heads) along the first
+    axis of data.
+
+    Required arguments:
+
+        1. data: (T,) or (T, N) array of coin flips.
+
+    Optional arguments:
+
+        1. dtype (default=np.float32): Floating point type of the output.
+        2. heads (default=None): Precomputed output of heads_paths.
+
+    """
+    if heads is None:
+        heads = heads_paths(data, np.int64)
+    T = heads.shape[0]
+    out = np.empty(heads.shape, dtype=dtype)
+    np.divide(heads, _tosses(T, heads.ndim, np.int64), out=out,
+              dtype=dtype, casting='unsafe')
+    return out
+
+def simulate(T, N=None, dist=fair_coin, seed=None, count_dtype=np.int32,
+             mean_dtype=np.float32, averages=True):
+    """Simulates N replications of Kerrich's experiment, each of length T,
+    in a single pass over cumulative sums.
+
+    Required arguments:
+
+        1. T: Number of flips in each replication.
+
+    Optional arguments:
+
+        1. N (default=None): Number of replications. If None, a single
+           replication is simulated and 1-D arrays are returned.
+        2. dist (default=fair_coin): Frozen scipy.stats distribution
+           from which flips are drawn.
+        3. seed (default=None): Seed (or RandomState) passed to dist.rvs.
+        4. count_dtype (default=np.int32): dtype of the difference paths.
+        5. mean_dtype (default=np.float32): dtype of the sample averages.
+        6. averages (default=True): Whether to compute sample averages.
+
+    Returns a tuple (difference, sample_averages), each of shape (T, N).
+    If averages is False, sample_averages is None.
+
+    """
+    size = (T,) if N is None else (T, N)
+    data = dist.rvs(size, random_state=seed)
+
+    # one cumulative sum is shared by both outputs
+    heads = heads_paths(data, count_dtype)
+    del data
+
+    if averages == True:
+        sample_averages = sample_average_paths(None, mean_dtype, heads)
+    else:
+        sample_averages = None
+    difference = difference_paths(None, count_dtype, heads)
+
+    return difference, sample_averages
+
+def log_checkpoints(T, num=200):
+    """Returns (at most) num unique, log-spaced integers between 1 and T.
+    These are the only indices that are distinguishable on a log-x plot.
+
+    """
+    points = np.logspace(0, np.log10(T), num)
+    return np.unique(np.round(points).astype(np.int64))
+
+def _random_state(seed):
+    """Converts seed into something that can be passed as random_state to
+    the rvs method of a frozen scipy.stats distribution. None means the
+    global NumPy random state (i.e., whatever np.random.seed set).
+
+    """
+    if seed is None or isinstance(seed, np.random.RandomState):
+        return seed
+    else:
+        return np.random.RandomState(seed)
+
+def stream(T, N, dist=fair_coin, checkpoints=None, chunksize=4096,
+           seed=None):
+    """Generator that draws N replications of length T in chunks of
+    chunksize draws (i.e., arrays of shape (chunksize, N)) and yields a
+    Checkpoint for each n in checkpoints. The full T x N matrix of draws
+    is never materialized.
+
+    Running totals are carried across chunks together with Welford
+    (i.e., Chan et al's pairwise) updates of the mean and variance. The
+    z-scores are the CLT statistics sqrt(n) * (mean - mu) / sigma, where
+    mu and sigma are the population moments of dist.
+
+    Required arguments:
+
+        1. T: Number of draws in each replication.
+        2. N: Number of replications.
+
+    Optional arguments:
+
+        1. dist (default=fair_coin): Any frozen scipy.stats distribution.
+        2. checkpoints (default=None): Sorted indices in [1, T] at which
+           to yield summary statistics. Default is log_checkpoints(T).
+        3. chunksize (default=4096): Number of draws per chunk.
+        4. seed (default=None): Seed or RandomState. None uses the
+           global NumPy random state.
+
+    """
+    if checkpoints is None:
+        checkpoints = log_checkpoints(T)
+    checkpoints = np.asarray(checkpoints, dtype=np.int64)
+    if checkpoints.size == 0:
+        return
+    if checkpoints[0] < 1 or checkpoints[-1] > T or \
+       np.any(np.diff(checkpoints) <= 0):
+        raise ValueError('checkpoints must be increasing and lie in [1, T]!')
+
+    prng = _random_state(seed)
+    mu, sigma = dist.mean(), dist.std()
+
+    # running state for each of the N replications
+    count = 0
+    total = 0
+    mean = np.zeros(N)
+    m2 = np.zeros(N)
+
+    # no need to draw beyond the last checkpoint
+    last = checkpoints[-1]
+    k = 0
+
+    while count < last:
+        size = min(chunksize, last - count)
+        chunk = dist.rvs((size, N), random_state=prng)
+
+        # totals are computed in the native dtype (exact for counts)
+        totals = total + np.cumsum(chunk, axis=0)
+
+        # deviations from the running mean keep the sums well conditioned
+        dev = chunk - mean
+        s1 = np.cumsum(dev, axis=0)
+        s2 = np.cumsum(dev**2, axis=0)
+        del chunk, dev
+
+        stop = np.searchsorted(checkpoints, count + size, side='right')
+        for n in checkpoints[k:stop]:
+            j = n - count
+            n_mean, n_m2 = _combine(count, mean, m2, j, s1[j - 1], s2[j - 1])
+            if n > 1:
+                var = n_m2 / (n - 1)
+            else:
+                var = np.nan * np.ones(N)
+            zscore = np.sqrt(n) * (n_mean - mu) / sigma
+            yield Checkpoint(n, totals[j - 1].copy(), n_mean, var, zscore)
+        k = stop
+
+        # roll the state forward to the end of the chunk
+        mean, m2 = _combine(count, mean, m2, size, s1[-1], s2[-1])
+        total = totals[-1].copy()
+        count += size
+
+def _combine(n_a, mean_a, m2_a, n_b, s1, s2):
+    """Combines running moments (n_a, mean_a, m2_a) with those of a further
+    n_b draws, given the sums s1 and s2 of the first and second powers of
+    the deviations of those draws from mean_a.
+
+    """
+    n = n_a + n_b
+    delta = s1 / n_b
+    mean = mean_a + s1 / n
+    m2 = m2_a + (s2 - s1 * delta) + delta**2 * n_a * n_b / n
+    return mean, m2
+
+def collect(checkpoints):
+    """Stacks the Checkpoints yielded by stream into a single Checkpoint
+    of arrays with shape (K,) for n and (K, N) for everything else.
+
+    """
+    records = list(checkpoints)
+    return Checkpoint(*[np.array(field) for field in zip(*records)])
+
+def _seed_sequences(seed, n):
+    """Returns n independent child SeedSequences of seed. Unlike
+    SeedSequence.spawn this does not mutate seed, so repeated calls with
+    the same seed give the same streams.
+
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.SeedSequence(seed.entropy,
+                                   spawn_key=seed.spawn_key + (i,))
+            for i in range(n)]
+
+def _run_block(args):
+    """Runs stream for a single block of replications (in a worker)."""
+    T, N, dist, checkpoints, chunksize, seed = args
+    prng = np.random.RandomState(np.random.MT19937(seed))
+    return collect(stream(T, N, dist, checkpoints, chunksize, prng))
+
+def merge(shards):
+    """Merges a list of Checkpoints (from blocks of replications) into a
+    single Checkpoint by concatenating their replications.
+
+    """
+    fields = [np.concatenate([getattr(shard, field) for shard in shards],
+                             axis=1)
+              for field in Checkpoint._fields[1:]]
+    return Checkpoint(shards[0].n, *fields)
+
+def run(T, N, dist=fair_coin, checkpoints=None, chunksize=4096, seed=None,
+        processes=None, blocksize=1000):
+    """Runs N replications of length T across a pool of processes and
+    returns the merged Checkpoint (see stream and collect).
+
+    Replications are split into blocks of blocksize, and each block draws
+    from its own child of a SeedSequence. Since the blocks (and hence the
+    streams) do not depend on the number of processes, the results are
+    bit-identical for any number of workers.
+
+    Required arguments:
+
+        1. T: Number of draws in each replication.
+        2. N: Number of replications.
+
+    Optional arguments:
+
+        1. dist (default=fair_coin): Any frozen scipy.stats distribution.
+        2. checkpoints (default=None): Indices at which to keep results.
+           Default is log_checkpoints(T).
+        3. chunksize (default=4096): Number of draws per chunk.
+        4. seed (default=None): Integer seed or SeedSequence.
+        5. processes (default=None): Number of worker processes. None
+           uses every core, 1 runs in the current process.
+        6. blocksize (default=1000): Number of replications per block.
+
+    """
+    if checkpoints is None:
+        checkpoints = log_checkpoints(T)
+
+    # partition the replications into blocks
+    sizes = [blocksize] * (N // blocksize)
+    if N % blocksize > 0:
+        sizes.append(N % blocksize)
+    seeds = _seed_sequences(seed, len(sizes))
+    tasks = [(T, size, dist, checkpoints, chunksize, ss)
+             for size, ss in zip(sizes, seeds)]
+
+    if processes == 1 or len(tasks) == 1:
+        shards = [_run_block(task) for task in tasks]
+    else:
+        pool = pools.pool(processes)
+        try:
+            shards = pool.map(_run_block, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    return merge(shards)
+
+def describe(dist):
+    """JSON serializable description of a frozen scipy.stats distribution."""
+    return {'name': dist.dist.name,
+            'args': [float(arg) for arg in dist.args],
+            'kwds': dict((k, float(v)) for k, v in dist.kwds.items())}
+
+def _describe_seed(seed):
+    """JSON serializable description of an integer seed or SeedSequence."""
+    if seed is None:
+        raise ValueError('Results can only be stored for an explicit seed!')
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return {'entropy': seed.entropy,
+            'spawn_key': [int(k) for k in seed.spawn_key]}
+
+def cached_run(store, T, N, dist=fair_coin, checkpoints=None, seed=None,
+               chunksize=4096, blocksize=1000, processes=None):
+    """Same as run, except that results are looked up in (or saved to) a
+    result_store.ResultStore keyed by T, N, dist, checkpoints, seed,
+    chunksize and blocksize (i.e., everything that affects the draws).
+    The returned Checkpoint holds read-only memory-mapped arrays, so
+    plotting code only reads the replications and checkpoints it slices.
+
+    Required arguments:
+
+        1. store: A result_store.ResultStore.
+        2. T: Number of draws in each replication.
+        3. N: Number of replications.
+
+    Optional arguments:
+
+        1. dist, checkpoints, seed, chunksize, blocksize, processes: See
+           run. seed must not be None. processes is not part of the key,
+           as it does not change the results.
+
+    """
+    if checkpoints is None:
+        checkpoints = log_checkpoints(T)
+    params = {'T': int(T), 'N': int(N), 'dist': describe(dist),
+              'checkpoints': [int(n) for n in checkpoints],
+              'seed': _describe_seed(seed), 'chunksize': int(chunksize),
+              'blocksize': int(blocksize)}
+
+    arrays = store.load(params)
+    if arrays is None:
+        results = run(T, N, dist, checkpoints, chunksize, seed, processes,
+                      blocksize)
+        arrays = store.save(params, results._asdict())
+
+    return Checkpoint(**arrays)
+
+# number of set bits in each possible byte
+_popcount_table = np.array([bin(i).count('1') for i in range(256)],
+                           dtype=np.uint8)
+
+def _popcount(x):
+    """Number of set bits in each element of a uint8 array."""
+    return _popcount_table[x]
+
+class PackedFlips(object):
+    """Coin flips stored as packed bits (8 flips per byte), together with
+    per-block prefix sums of heads so that running counts at arbitrary
+    checkpoints can be computed from a handful of popcounts.
+
+    Flips of each replication are stored contiguously in a row of bits,
+    an array of shape (N, nbytes). Bits are big-endian within each byte,
+    as in np.packbits, i.e., the first flip is the most significant bit.
+
+    """
+
+    def __init__(self, bits, T, blocksize=64):
+        """Required arguments:
+
+            1. bits: (N, nbytes) uint8 array of packed flips.
+            2. T: Number of flips in each replication.
+
+        Optional arguments:
+
+            1. blocksize (default=64): Number of bytes per block of the
+               prefix sums.
+
+        """
+        self.T = T
+        self.blocksize = blocksize
+
+        # pad to whole blocks plus one, so that n=T never runs off the end
+        nblocks = (T // 8) // blocksize + 1
+        bits = np.atleast_2d(np.asarray(bits, dtype=np.uint8))
+        self.bits = np.zeros((bits.shape[0], nblocks * blocksize), np.uint8)
+        self.bits[:, :bits.shape[1]] = bits
+
+        # clear any bits beyond T
+        if T % 8 > 0:
+            self.bits[:, T // 8] &= (0xFF << (8 - T % 8)) & 0xFF
+        self.bits[:, (T + 7) // 8:] = 0
+
+        # heads before each block
+        blocks = self.bits.reshape(self.N, nblocks, blocksize)
+        counts = _popcount(blocks).sum(axis=2, dtype=np.int64)
+        self.prefix = np.zeros((self.N, nblocks + 1), dtype=np.int64)
+        np.cumsum(counts, axis=1, out=self.prefix[:, 1:])
+
+    @property
+    def N(self):
+        """Number of replications."""
+        return self.bits.shape[0]
+
+    @property
+    def nbytes(self):
+        """Memory used by the packed flips and the prefix sums."""
+        return self.bits.nbytes + self.prefix.nbytes
+
+    @classmethod
+    def random(cls, T, N=1, seed=None, blocksize=64):
+        """Flips a fair coin T times in each of N replications, using every
+        bit of the raw random bytes as one flip.
+
+        Optional arguments:
+
+            1. N (default=1): Number of replications.
+            2. seed (default=None): Seed or RandomState. None uses the
+               global NumPy random state.
+            3. blocksize (default=64): See PackedFlips.
+
+        """
+        prng = _random_state(seed)
+        if prng is None:
+            random_bytes = np.random.bytes
+        else:
+            random_bytes = prng.bytes
+
+        nbytes = (T + 7) // 8
+        bits = np.empty((N, nbytes), dtype=np.uint8)
+        for j in range(N):
+            bits[j] = np.frombuffer(random_bytes(nbytes), dtype=np.uint8)
+
+        return cls(bits, T, blocksize)
+
+    @classmethod
+    def pack(cls, data, blocksize=64):
+        """Packs a (T,) or (T, N) array of zeros and ones (e.g., draws from
+        fair_coin.rvs).
+
+        """
+        data = np.asarray(data)
+        if data.ndim == 1:
+            data = data[:, np.newaxis]
+        bits = np.packbits(data.T.astype(bool), axis=1)
+        return cls(bits, data.shape[0], blocksize)
+
+    def heads(self, n):
+        """Number of heads in the first n flips of every replication.
+
+        Required arguments:
+
+            1. n: Scalar or (K,) array of checkpoints in [0, T].
+
+        Returns an int64 array of shape (K, N).
+
+        """
+        n = np.atleast_1d(np.asarray(n, dtype=np.int64))
+        if np.any(n < 0) or np.any(n > self.T):
+            raise ValueError('checkpoints must lie in [0, T]!')
+
+        B = self.blocksize
+        full_bytes, remainder = n // 8, n % 8
+        block = full_bytes // B
+
+        heads = np.empty((n.size, self.N), dtype=np.int64)
+
+        # work on batches of checkpoints to bound temporary memory
+        batch = max(1, 2**22 // (self.N * B))
+        for start in range(0, n.size, batch):
+            s = slice(start, start + batch)
+
+            # popcounts of the whole bytes preceding n within its block
+            offsets = block[s, np.newaxis] * B + np.arange(B)
+            before = offsets < full_bytes[s, np.newaxis]
+            within = (_popcount(self.bits[:, offsets]) * before).sum(
+                axis=2, dtype=np.int64)
+
+            # popcount of the leading bits of the partial byte
+            last = self.bits[:, full_bytes[s]]
+            shift = ((8 - remainder[s]) % 8).astype(np.uint8)
+            partial = np.where(remainder[s] > 0,
+                               _popcount(np.right_shift(last, shift)), 0)
+
+            heads[s] = (self.prefix[:, block[s]] + within + partial).T
+
+        return heads
+
+    def difference(self, n):
+        """Observed minus expected heads, 2 * Heads - n (see heads)."""
+        n = np.atleast_1d(np.asarray(n, dtype=np.int64))
+        return 2 * self.heads(n) - n[:, np.newaxis]
+
+    def fraction_heads(self, n):
+        """Fraction of heads in the first n flips (see heads)."""
+        n = np.atleast_1d(np.asarray(n, dtype=np.int64))
+        return self.heads(n) / n[:, np.newaxis]
+
+def exact_envelope(n, q=fanchart.quantiles, p=0.5):
+    """Exact quantiles of the difference between observed and expected
+    heads, 2 * Heads - n, and of the sample mean, Heads / n, where Heads
+    is Binomial(n, p). No simulation required!
+
+    Required arguments:
+
+        1. n: (K,) array of checkpoints (i.e., numbers of flips).
+
+    Optional arguments:
+
+        1. q (default=fanchart.quantiles): Sequence of quantiles.
+        2. p (default=0.5): Probability of heads.
+
+    Returns a tuple (difference, sample_mean) of (len(q), K) arrays which
+    can be passed straight to fanchart.fan_chart.
+
+    """
+    n = np.asarray(n, dtype=np.int64)
+    heads = stats.binom.ppf(np.asarray(q)[:, np.newaxis], n, p)
+    difference = 2 * heads - n
+    sample_mean = heads / n
+    return difference, sample_mean
+
+def percentiles(data, p=0.5):
+    """Reports where an observed path of heads falls in the exact
+    distribution of Heads at each checkpoint, as a mid-p percentile
+    (i.e., P(X < Heads) + 0.5 * P(X = Heads)).
+
+    Required arguments:
+
+        1. data: DataFrame indexed by the number of tosses with a column
+           'Heads' (e.g., the Kerrich data).
+
+    Optional arguments:
+
+        1. p (default=0.5): Probability of heads.
+
+    """
+    n = data.index.values.astype(np.int64)
+    heads = data['Heads'].values
+    mid_p = stats.binom.cdf(heads, n, p) - 0.5 * stats.binom.pmf(heads, n, p)
+    return pd.Series(100 * mid_p, index=data.index, name='Percentile')
@@ -0,0 +1,96 @@
+"""Adds National Bureau of Economic Research (NBER) recession bands to
+Matplotlib figures.
+
+The recession dates are parsed once (per file) into arrays of peaks and
+troughs, and all of the bands visible on an axes are drawn as a single
+collection rather than one patch per recession.
+
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+from matplotlib.collections import PolyCollection
+
+# default file of recession dates (with Peak and Trough columns)
+dates_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'NBER Dates.txt')
+
+# parsed recession dates, keyed by path and modification time
+_cache = {}
+
+def recessions(path=None):
+    """Returns (peaks, troughs) as datetime64[D] arrays."""
+    path = dates_path if path is None else path
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in _cache:
+        dates = pd.read_csv(path, parse_dates=['Peak', 'Trough'])
+        _cache[key] = (dates['Peak'].values.astype('datetime64[D]'),
+                       dates['Trough'].values.astype('datetime64[D]'))
+    return _cache[key]
+
+def _years(dates):
+    """datetime64[D] dates as fractional years (e.g., 1990.5)."""
+    years = dates.astype('datetime64[Y]')
+    start = years.astype('datetime64[D]')
+    length = (years + 1).astype('datetime64[D]') - start
+    return 1970 + years.astype(np.int64) + (dates - start) / length
+
+def _to_axis(ax, dates, units):
+    """Converts dates into the units of the x-axis of ax: years for
+    axes without units (e.g., integer years), otherwise whatever the
+    axis' converter (Matplotlib's or pandas') makes of them.
+
+    """
+    if units is None:
+        units = 'dates' if ax.xaxis.have_units() else 'years'
+    if units == 'years':
+        return _years(dates)
+    elif units == 'dates':
+        values = [pd.Timestamp(d).to_pydatetime() for d in dates]
+        return np.asarray(ax.xaxis.convert_units(values), dtype=np.float64)
+    else:
+        raise ValueError("units must be None, 'years' or 'dates'!")
+
+def shade(ax=None, path=None, units=None, facecolor='grey', alpha=0.5,
+          **kwargs):
+    """Shades the NBER recessions visible on ax.
+
+    Optional arguments:
+
+        1. ax (default=None): Axes to shade. Default is the current axes
+           (i.e., plt.gca()).
+        2. path (default=None): File of recession dates. Default is
+           dates_path.
+        3. units (default=None): Either 'dates' (date axes, including
+           pandas' time series axes), 'years' (numeric year axes) or
+           None to choose based on whether the x-axis has units.
+        4. facecolor, alpha and any other keyword arguments are passed
+           to PolyCollection.
+
+    The axis limits are left as they are (bands are clipped to them), so
+    call this after plotting the data. Returns the PolyCollection.
+
+    """
+    ax = plt.gca() if ax is None else ax
+    peaks, troughs = recessions(path)
+    x0 = _to_axis(ax, peaks, units)
+    x1 = _to_axis(ax, troughs, units)
+
+    # keep (and clip) the bands in the visible range
+    lo, hi = sorted(ax.get_xlim())
+    visible = (x1 >= lo) & (x0 <= hi)
+    x0 = np.clip(x0[visible], lo, hi)
+    x1 = np.clip(x1[visible], lo, hi)
+
+    # rectangles spanning the full height of the axes
+    verts = np.empty((x0.size, 4, 2))
+    verts[:, :, 0] = np.column_stack([x0, x0, x1, x1])
+    verts[:, :, 1] = [0, 1, 1, 0]
+
+    bands = PolyCollection(verts, facecolor=facecolor, alpha=alpha,
+                           edgecolor='none', transform=ax.get_xaxis_transform(),
+                           **kwargs)
+    ax.add_collection(bands, autolim=False)
+    return bands
@@ -0,0 +1,13 @@
+"""Process pools shared by the simulation and estimation modules."""
+import multiprocessing as mp
+
+def pool(processes=None):
+    """Returns a multiprocessing Pool of processes workers (None uses
+    every core). Workers are forked where possible, because the figure
+    scripts that end up running them have no __main__ guard and would
+    otherwise be re-executed by every worker.
+
+    """
+    if 'fork' in mp.get_all_start_methods():
+        return mp.get_context('fork').Pool(processes)
+    return mp.Pool(processes)
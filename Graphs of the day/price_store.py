@@ -0,0 +1,249 @@
+"""Local, append-only store of daily price histories (e.g., the S&P 500).
+
+Each symbol lives in its own directory, with one raw binary file per
+column (int32 day numbers for the dates, float64 prices and volume) and
+a meta.json file recording how many rows are valid. Updates download
+only the days after the last stored date and append them to the column
+files, so the history is never re-downloaded. Reads memory-map the
+columns and slice them by date.
+
+"""
+import json
+import os
+import re
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# default location of the store (override with the PRICE_STORE variable)
+store_dir = os.environ.get('PRICE_STORE',
+                           os.path.join(os.path.expanduser('~'),
+                                        '.price_store'))
+
+# columns returned by get_data_yahoo
+columns = ('Open', 'High', 'Low', 'Close', 'Volume', 'Adj Close')
+
+# how each column is aggregated by monthly(how='ohlc')
+ohlc = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last',
+        'Volume': 'sum', 'Adj Close': 'last'}
+
+def _yahoo(symbol, start, end):
+    from pandas_datareader.data import get_data_yahoo
+    return get_data_yahoo(symbol, start=start, end=end)
+
+def _days(dates):
+    """Dates as int32 day numbers (days since 1970-01-01)."""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int32)
+
+def validate(frame):
+    """Raises ValueError unless frame is a sane daily OHLCV history."""
+    days = _days(frame.index.values)
+    if np.any(np.diff(days) <= 0):
+        raise ValueError('Dates must be strictly increasing!')
+    if np.any(frame['High'].values < frame['Low'].values):
+        raise ValueError('High is below Low!')
+    if np.any(frame['Volume'].values < 0):
+        raise ValueError('Volume is negative!')
+
+class PriceStore(object):
+    """Daily price history of a single symbol."""
+
+    def __init__(self, symbol, root=None, fetcher=None):
+        """Required arguments:
+
+            1. symbol: Ticker symbol (e.g., '^GSPC').
+
+        Optional arguments:
+
+            1. root (default=None): Directory of the store. Default is
+               store_dir.
+            2. fetcher (default=None): Function of (symbol, start, end)
+               returning a DataFrame of columns indexed by date. Default
+               is pandas_datareader.data.get_data_yahoo.
+
+        """
+        self.symbol = symbol
+        root = store_dir if root is None else root
+        self.path = os.path.join(root, re.sub(r'[^A-Za-z0-9_.-]', '_', symbol))
+        self.fetcher = _yahoo if fetcher is None else fetcher
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+    def _file(self, name):
+        return os.path.join(self.path, name.replace(' ', '_') + '.bin')
+
+    @property
+    def rows(self):
+        """Number of stored rows."""
+        return self.metadata()['rows']
+
+    def metadata(self):
+        meta_path = os.path.join(self.path, 'meta.json')
+        if not os.path.isfile(meta_path):
+            return {'symbol': self.symbol, 'rows': 0, 'last': None}
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _write_metadata(self, meta):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f, indent=2)
+        meta_path = os.path.join(self.path, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        os.rename(tmp_path, meta_path)
+
+    def _column(self, name, rows):
+        """Memory-mapped view of the first rows of a column."""
+        dtype = np.int32 if name == 'date' else np.float64
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(self._file(name), dtype=dtype, mode='r',
+                         shape=(rows,))
+
+    def _append(self, frame):
+        """Appends (validated, new) rows to the column files."""
+        meta = self.metadata()
+        rows = meta['rows']
+        arrays = {'date': _days(frame.index.values)}
+        for name in columns:
+            arrays[name] = frame[name].values.astype(np.float64)
+
+        for name, array in arrays.items():
+            with open(self._file(name), 'ab') as f:
+                # drop anything past the last committed row (e.g., from
+                # an interrupted append)
+                f.truncate(rows * array.itemsize)
+                f.seek(rows * array.itemsize)
+                f.write(array.tobytes())
+
+        # the rows only count once meta.json says so
+        meta['rows'] = rows + len(frame)
+        meta['last'] = str(frame.index[-1].date())
+        self._write_metadata(meta)
+
+    def clear(self):
+        """Deletes every stored row."""
+        meta = self.metadata()
+        meta['rows'], meta['last'] = 0, None
+        self._write_metadata(meta)
+
+    def update(self, start='1950-01-03', end=None, rtol=1e-6):
+        """Downloads and appends the rows after the last stored date.
+
+        The download starts at the last stored date, so the overlapping
+        row is compared with the stored one: if they differ (e.g., the
+        history was revised) the whole history is downloaded again.
+
+        Optional arguments:
+
+            1. start (default='1950-01-03'): First date of the history
+               (only used when the store is empty).
+            2. end (default=None): Last date to download. Default is
+               today.
+            3. rtol (default=1e-6): Relative tolerance when comparing
+               the overlapping row.
+
+        Returns the number of rows appended.
+
+        """
+        meta = self.metadata()
+        if meta['rows'] == 0:
+            new = self.fetcher(self.symbol, start, end)
+        else:
+            if end is not None and pd.Timestamp(end) <= pd.Timestamp(meta['last']):
+                return 0
+            new = self.fetcher(self.symbol, meta['last'], end)
+
+        new = new[~new.index.duplicated(keep='last')].sort_index()
+        validate(new)
+
+        if meta['rows'] > 0:
+            last = pd.Timestamp(meta['last'])
+            overlap = new[new.index == last]
+            if len(overlap) > 0:
+                stored = self.read(last, last)
+                same = np.allclose(overlap[list(columns)].values,
+                                   stored[list(columns)].values,
+                                   rtol=rtol, equal_nan=True)
+                if not same:
+                    warnings.warn('%s was revised, re-downloading its history'
+                                  % self.symbol)
+                    first = self.read().index[0]
+                    self.clear()
+                    return self.update(first, end, rtol)
+            new = new[new.index > last]
+
+        if len(new) > 0:
+            self._append(new)
+        return len(new)
+
+    def _slice(self, start, end):
+        """Row bounds of the dates between start and end (inclusive)."""
+        rows = self.rows
+        days = self._column('date', rows)
+        lo = 0 if start is None else \
+            np.searchsorted(days, _days(pd.Timestamp(start).to_datetime64()))
+        hi = rows if end is None else \
+            np.searchsorted(days, _days(pd.Timestamp(end).to_datetime64()),
+                            side='right')
+        return rows, days, lo, hi
+
+    def read(self, start=None, end=None):
+        """Returns the stored rows between start and end (inclusive) as a
+        DataFrame indexed by Date.
+
+        """
+        rows, days, lo, hi = self._slice(start, end)
+        index = pd.DatetimeIndex(days[lo:hi].astype('datetime64[D]'),
+                                 name='Date')
+        data = dict((name, np.array(self._column(name, rows)[lo:hi]))
+                    for name in columns)
+        return pd.DataFrame(data, index=index, columns=list(columns))
+
+    def monthly(self, start=None, end=None, how='mean'):
+        """Monthly aggregates of the stored rows between start and end,
+        indexed by the first day of each month (i.e., like
+        resample('MS')).
+
+        Optional arguments:
+
+            1. start, end (default=None): See read.
+            2. how (default='mean'): 'mean' averages every column,
+               'ohlc' takes the first Open, highest High, lowest Low,
+               last Close and total Volume of each month.
+
+        """
+        if how not in ('mean', 'ohlc'):
+            raise ValueError("how must be 'mean' or 'ohlc'!")
+        rows, days, lo, hi = self._slice(start, end)
+        months = days[lo:hi].astype('datetime64[D]').astype('datetime64[M]')
+        if months.size == 0:
+            return pd.DataFrame(columns=list(columns))
+
+        # rows at which each month starts
+        starts = np.concatenate([[0],
+                                 np.flatnonzero(months[1:] != months[:-1]) + 1])
+        counts = np.diff(np.append(starts, months.size))
+        index = pd.DatetimeIndex(months[starts].astype('datetime64[D]'),
+                                 name='Date')
+
+        data = {}
+        for name in columns:
+            values = np.asarray(self._column(name, rows)[lo:hi])
+            rule = 'mean' if how == 'mean' else ohlc[name]
+            if rule == 'mean':
+                data[name] = np.add.reduceat(values, starts) / counts
+            elif rule == 'sum':
+                data[name] = np.add.reduceat(values, starts)
+            elif rule == 'max':
+                data[name] = np.maximum.reduceat(values, starts)
+            elif rule == 'min':
+                data[name] = np.minimum.reduceat(values, starts)
+            elif rule == 'first':
+                data[name] = values[starts]
+            else:
+                data[name] = values[starts + counts - 1]
+        return pd.DataFrame(data, index=index, columns=list(columns))
@@ -0,0 +1,323 @@
+"""Local cache of the Penn World Tables (PWT).
+
+Each PWT archive is downloaded once into a cache directory and verified
+by its SHA-256 checksum. The first time it is read, the CSV is converted
+into a typed columnar store (one .npy file per column: int16 year,
+categorical isocode, float32 values), which later calls memory-map. A
+pre-seeded cache directory works fully offline.
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+from collections import namedtuple
+from urllib.request import urlopen
+
+import numpy as np
+import pandas as pd
+
+# default location of the cache (override with the PWT_CACHE variable)
+cache_dir = os.environ.get('PWT_CACHE',
+                           os.path.join(os.path.expanduser('~'), '.pwt_cache'))
+
+def archive_name(version, date):
+    """File name of the PWT zip archive for version and date."""
+    return 'pwt' + str(version) + '_' + date + 'version.zip'
+
+def archive_url(version, date):
+    """Download URL of the PWT zip archive for version and date."""
+    return 'http://pwt.econ.upenn.edu/Downloads/pwt' + str(version) + \
+           '/' + archive_name(version, date)
+
+def csv_name(version):
+    """Name of the CSV file (inside the archive) with the PWT data."""
+    return 'pwt' + str(version) + '_wo_country_names_wo_g_vars.csv'
+
+def sha256(path, blocksize=2**20):
+    """SHA-256 checksum of the file at path."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def fetch_archive(version=71, date='11302012', cache=None, checksum=None):
+    """Returns the path to a verified local copy of the PWT archive,
+    downloading it only if the cache does not already hold a good copy.
+
+    Optional arguments:
+
+        1. version (default=71): PWT version.
+        2. date (default='11302012'): Release date of the archive.
+        3. cache (default=None): Cache directory. Default is cache_dir.
+        4. checksum (default=None): Expected SHA-256 checksum. If None,
+           the checksum recorded when the archive was first downloaded
+           is used.
+
+    """
+    cache = cache_dir if cache is None else cache
+    if not os.path.isdir(cache):
+        os.makedirs(cache)
+
+    path = os.path.join(cache, archive_name(version, date))
+    sum_path = path + '.sha256'
+
+    if checksum is None and os.path.isfile(sum_path):
+        with open(sum_path) as f:
+            checksum = f.read().strip()
+
+    # use the cached copy if it is intact
+    if os.path.isfile(path):
+        digest = sha256(path)
+        if checksum is None or digest == checksum:
+            if not os.path.isfile(sum_path):
+                with open(sum_path, 'w') as f:
+                    f.write(digest)
+            return path
+
+    # otherwise, download it (to a temporary file first)
+    fd, tmp_path = tempfile.mkstemp(dir=cache)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            response = urlopen(archive_url(version, date))
+            shutil.copyfileobj(response, f)
+        digest = sha256(tmp_path)
+        if checksum is not None and digest != checksum:
+            raise IOError('Checksum mismatch for %s: expected %s, got %s!' %
+                          (archive_name(version, date), checksum, digest))
+        os.rename(tmp_path, path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    with open(sum_path, 'w') as f:
+        f.write(digest)
+    return path
+
+def columnar_dir(version=71, date='11302012', cache=None):
+    """Directory of the columnar store for version and date."""
+    cache = cache_dir if cache is None else cache
+    return os.path.join(cache, 'pwt' + str(version) + '_' + date)
+
+def build_columnar(frame, target):
+    """Writes a DataFrame of PWT data (with year and isocode columns) to a
+    columnar store in the directory target.
+
+    """
+    parent = os.path.dirname(os.path.abspath(target))
+    tmp_dir = tempfile.mkdtemp(dir=parent)
+    meta = {'columns': [], 'categories': {}}
+    try:
+        for column in frame.columns:
+            values = frame[column]
+            if column == 'year':
+                array = values.values.astype(np.int16)
+            elif not pd.api.types.is_numeric_dtype(values):
+                categorical = pd.Categorical(values)
+                array = np.asarray(categorical.codes, dtype=np.int16)
+                meta['categories'][column] = \
+                    [str(c) for c in categorical.categories]
+            else:
+                array = values.values.astype(np.float32)
+            np.save(os.path.join(tmp_dir, column + '.npy'), array)
+            meta['columns'].append(column)
+
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        os.rename(tmp_dir, target)
+    except:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def load(columns=None, version=71, date='11302012', cache=None,
+         checksum=None):
+    """Returns PWT columns as a dictionary of memory-mapped arrays, along
+    with a dictionary of categories for the categorical columns (i.e.,
+    isocode[i] is categories['isocode'][codes[i]]).
+
+    Optional arguments:
+
+        1. columns (default=None): Columns to load (year and isocode are
+           always included). None loads every column.
+        2. version, date, cache, checksum: See fetch_archive.
+
+    """
+    target = columnar_dir(version, date, cache)
+    meta_path = os.path.join(target, 'meta.json')
+
+    # convert the CSV the first time it is read
+    if not os.path.isfile(meta_path):
+        path = fetch_archive(version, date, cache, checksum)
+        with zipfile.ZipFile(path, 'r') as archive:
+            with archive.open(csv_name(version)) as f:
+                frame = pd.read_csv(f)
+        build_columnar(frame, target)
+
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    if columns is None:
+        columns = meta['columns']
+    columns = ['year', 'isocode'] + \
+              [c for c in columns if c not in ('year', 'isocode')]
+
+    missing = set(columns) - set(meta['columns'])
+    if missing:
+        raise KeyError('Not in PWT: %s' % ', '.join(sorted(missing)))
+
+    arrays = dict((c, np.load(os.path.join(target, c + '.npy'),
+                              mmap_mode='r'))
+                  for c in columns)
+    return arrays, meta['categories']
+
+def read_frame(columns=None, version=71, date='11302012', cache=None,
+               checksum=None):
+    """Same as load, but returns a DataFrame indexed by (year, isocode)."""
+    arrays, categories = load(columns, version, date, cache, checksum)
+
+    def decode(column):
+        # code -1 (i.e., missing) picks out the trailing None
+        labels = np.asarray(categories[column] + [None], dtype=object)
+        return labels[arrays[column]]
+
+    index = pd.MultiIndex.from_arrays([arrays['year'], decode('isocode')],
+                                      names=['year', 'isocode'])
+    frame = pd.DataFrame(index=index)
+    for column in arrays:
+        if column in ('year', 'isocode'):
+            continue
+        elif column in categories:
+            frame[column] = decode(column)
+        else:
+            frame[column] = arrays[column]
+    return frame
+
+# what read_columns read, kept and (at most) held in memory
+LoadStats = namedtuple('LoadStats', ['bytes_read', 'rows_read', 'rows_kept',
+                                     'peak_bytes', 'max_rss'])
+
+class _CountingReader(object):
+    """File-like wrapper that counts the bytes read through it."""
+
+    def __init__(self, f):
+        self.f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self.f.readline(size)
+        self.bytes_read += len(data)
+        return data
+
+def _max_rss():
+    """Peak resident set size of this process in bytes (None if unknown)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else 1024 * rss
+
+def read_columns(source=None, columns=None, dtype=np.float32,
+                 chunksize=100000, countries=None, years=None, version=71,
+                 date='11302012', cache=None):
+    """Streams a PWT CSV in chunks, keeping only the requested columns (as
+    compact dtypes) and rows. The full table is never held in memory.
+
+    Optional arguments:
+
+        1. source (default=None): Path or file object of a PWT CSV. None
+           streams the CSV straight out of the cached archive (see
+           fetch_archive) without extracting it.
+        2. columns (default=None): Value columns to keep (year and
+           isocode are always kept). None keeps every numeric column.
+        3. dtype (default=np.float32): dtype of the value columns.
+        4. chunksize (default=100000): Number of rows per chunk.
+        5. countries (default=None): Sequence of isocodes to keep.
+        6. years (default=None): (first, last) years to keep.
+        7. version, date, cache: See fetch_archive.
+
+    Returns a tuple (arrays, categories, stats) where arrays and
+    categories are as for load and stats is a LoadStats.
+
+    """
+    if source is None:
+        archive = zipfile.ZipFile(fetch_archive(version, date, cache), 'r')
+        f = archive.open(csv_name(version))
+    elif isinstance(source, str):
+        archive, f = None, open(source, 'rb')
+    else:
+        archive, f = None, source
+
+    reader = _CountingReader(f)
+    usecols = None if columns is None else ['year', 'isocode'] + list(columns)
+    dtypes = {'year': np.int16, 'isocode': object}
+    if columns is not None:
+        dtypes.update((c, dtype) for c in columns)
+
+    codes, parts = {}, None
+    rows_read, rows_kept, kept_bytes, peak_bytes = 0, 0, 0, 0
+    try:
+        for chunk in pd.read_csv(reader, usecols=usecols, dtype=dtypes,
+                                 chunksize=chunksize):
+            rows_read += len(chunk)
+            chunk_bytes = chunk.memory_usage(deep=True).sum()
+
+            # without explicit columns, keep every numeric column
+            if parts is None:
+                if columns is None:
+                    columns = [c for c in chunk.columns
+                               if c not in ('year', 'isocode') and
+                               chunk[c].dtype.kind in 'biuf']
+                parts = dict((c, []) for c in ['year', 'isocode'] + columns)
+
+            # filter countries and years on the fly (dropping rows without
+            # an isocode, as the columnar store does)
+            mask = chunk['isocode'].notna().values
+            if countries is not None:
+                mask &= chunk['isocode'].isin(countries).values
+            if years is not None:
+                year = chunk['year'].values
+                mask &= (year >= years[0]) & (year <= years[1])
+            chunk = chunk[mask]
+
+            # categorical codes for isocode that are consistent across chunks
+            labels, inverse = np.unique(chunk['isocode'].values.astype(str),
+                                        return_inverse=True)
+            for label in labels:
+                codes.setdefault(label, len(codes))
+            lookup = np.array([codes[label] for label in labels],
+                              dtype=np.int16)
+            parts['isocode'].append(lookup[inverse.ravel()])
+            parts['year'].append(chunk['year'].values.astype(np.int16))
+            for c in columns:
+                parts[c].append(chunk[c].values.astype(dtype))
+
+            rows_kept += len(chunk)
+            kept_bytes += sum(p[-1].nbytes for p in parts.values())
+            peak_bytes = max(peak_bytes, kept_bytes + chunk_bytes)
+    finally:
+        if source is None or isinstance(source, str):
+            f.close()
+        if archive is not None:
+            archive.close()
+
+    if parts is None:
+        raise ValueError('No data in PWT CSV!')
+    arrays = dict((c, np.concatenate(p)) for c, p in parts.items())
+    categories = {'isocode': sorted(codes, key=codes.get)}
+    stats = LoadStats(reader.bytes_read, rows_read, rows_kept, peak_bytes,
+                      _max_rss())
+    return arrays, categories, stats
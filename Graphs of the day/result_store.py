@@ -0,0 +1,87 @@
+"""On-disk store of simulation results that can be re-opened lazily (as
+memory-mapped arrays) in order to re-render figures without re-simulating.
+
+Each simulation lives in its own directory, named by a hash of its
+parameters, containing a meta.json file and one .npy file per array.
+
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+class ResultStore(object):
+    """Directory of simulation results keyed by simulation parameters."""
+
+    def __init__(self, root='simulations'):
+        """Optional arguments:
+
+            1. root (default='simulations'): Directory in which to keep
+               the results. Created if it does not exist.
+
+        """
+        self.root = root
+        if not os.path.isdir(root):
+            os.makedirs(root)
+
+    @staticmethod
+    def key(params):
+        """Hash of a dictionary of (JSON serializable) parameters."""
+        blob = json.dumps(params, sort_keys=True).encode('utf-8')
+        return hashlib.sha1(blob).hexdigest()
+
+    def path(self, params):
+        """Directory in which the results for params are stored."""
+        return os.path.join(self.root, self.key(params))
+
+    def __contains__(self, params):
+        return os.path.isfile(os.path.join(self.path(params), 'meta.json'))
+
+    def save(self, params, arrays):
+        """Writes a dictionary of arrays (and params as metadata) to the
+        store and returns them re-opened as memory-mapped arrays. The
+        directory is written to a temporary location first and then moved
+        into place, so readers never see partial results.
+
+        """
+        target = self.path(params)
+        tmp_dir = tempfile.mkdtemp(dir=self.root)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, name + '.npy'),
+                        np.asarray(array))
+            meta = {'params': params, 'arrays': sorted(arrays),
+                    'created': time.time()}
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as meta_file:
+                json.dump(meta, meta_file, sort_keys=True, indent=2)
+
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            os.rename(tmp_dir, target)
+        except:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        return self.load(params)
+
+    def metadata(self, params):
+        """Returns the metadata stored alongside the results for params."""
+        with open(os.path.join(self.path(params), 'meta.json')) as meta_file:
+            return json.load(meta_file)
+
+    def load(self, params, mmap_mode='r'):
+        """Returns a dictionary of memory-mapped arrays for params, or None
+        if the store has no results for params. Nothing is read from disk
+        until the arrays are sliced.
+
+        """
+        if params not in self:
+            return None
+        target = self.path(params)
+        return dict((name, np.load(os.path.join(target, name + '.npy'),
+                                   mmap_mode=mmap_mode))
+                    for name in self.metadata(params)['arrays'])
@@ -0,0 +1,126 @@
+"""NaN-aware rolling-window statistics down the rows (i.e., the time axis)
+of arrays of time series, e.g., year x country matrices.
+
+Rolling means come from differences of cumulative sums, so a whole matrix
+is smoothed in one vectorized pass regardless of the window length.
+
+"""
+import warnings
+
+import numpy as np
+
+def _float(x):
+    """x as a floating point array (integer series become float64)."""
+    x = np.asarray(x)
+    if x.dtype.kind == 'f':
+        return x
+    return x.astype(np.float64)
+
+def _offset(window, align):
+    """How far the end of each window lies beyond the row it belongs to."""
+    if align == 'backward':
+        return 0
+    elif align == 'centre':
+        return (window - 1) // 2
+    elif align == 'forward':
+        return window - 1
+    else:
+        raise ValueError("align must be 'backward', 'centre' or 'forward'!")
+
+def _bounds(T, window, align):
+    """First and one past the last row of each (truncated) window."""
+    ends = np.arange(T) + _offset(window, align)
+    starts = ends - window + 1
+    return np.clip(starts, 0, T), np.clip(ends + 1, 0, T)
+
+def _counts(valid, lo, hi):
+    """Number of valid observations in each window."""
+    N = np.zeros((valid.shape[0] + 1,) + valid.shape[1:], dtype=np.int64)
+    np.cumsum(valid, axis=0, out=N[1:])
+    return N[hi] - N[lo]
+
+def _lead(values, lead, out):
+    """out[t] = values[t + lead], with NaNs where t + lead is out of range
+    (i.e., DataFrame.shift(-lead)).
+
+    """
+    T = values.shape[0]
+    if out is None:
+        out = np.empty_like(values)
+    if abs(lead) >= T:
+        out[...] = np.nan
+    elif lead >= 0:
+        out[:T - lead] = values[lead:]
+        out[T - lead:] = np.nan
+    else:
+        out[-lead:] = values[:T + lead]
+        out[:-lead] = np.nan
+    return out
+
+def rolling_mean(x, window, min_periods=None, align='backward', lead=0,
+                 out=None):
+    """Rolling mean of x down its rows, ignoring NaNs.
+
+    Required arguments:
+
+        1. x: (T,) or (T, ...) array.
+        2. window: Number of rows in each window.
+
+    Optional arguments:
+
+        1. min_periods (default=None): Minimum number of non-NaN values
+           in a window (otherwise the result is NaN). Default is window.
+        2. align (default='backward'): Whether the window ends at
+           ('backward'), is centred on ('centre') or starts at
+           ('forward') each row. Windows are truncated at the ends.
+        3. lead (default=0): Shift the result back by lead rows (i.e.,
+           row t gets the value of row t + lead, NaN past the end).
+        4. out (default=None): Array in which to store the result. May
+           be x itself.
+
+    With align='backward', rolling_mean(x, window, min_periods, lead=h)
+    is pd.rolling_mean(x, window, min_periods).shift(-h).
+
+    """
+    x = _float(x)
+    if min_periods is None:
+        min_periods = window
+    valid = ~np.isnan(x)
+    lo, hi = _bounds(x.shape[0], window, align)
+
+    # cumulative sums (in double precision) with a leading row of zeros
+    S = np.zeros((x.shape[0] + 1,) + x.shape[1:], dtype=np.float64)
+    np.cumsum(np.where(valid, x, 0), axis=0, out=S[1:])
+
+    counts = _counts(valid, lo, hi)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (S[hi] - S[lo]) / counts
+    mean[(counts < min_periods) | (counts == 0)] = np.nan
+
+    return _lead(mean.astype(x.dtype, copy=False), lead, out)
+
+def rolling_median(x, window, min_periods=None, align='backward', lead=0,
+                   out=None):
+    """Rolling median of x down its rows, ignoring NaNs. Arguments are as
+    for rolling_mean.
+
+    """
+    x = _float(x)
+    if min_periods is None:
+        min_periods = window
+    T = x.shape[0]
+    valid = ~np.isnan(x)
+    lo, hi = _bounds(T, window, align)
+
+    # pad with NaNs so that truncated windows are ordinary windows
+    padding = np.nan * np.ones((window - 1,) + x.shape[1:], dtype=x.dtype)
+    padded = np.concatenate([padding, x, padding])
+    views = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+    windows = views[np.arange(T) + _offset(window, align)]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # all-NaN windows
+        median = np.nanmedian(windows, axis=-1)
+    median[_counts(valid, lo, hi) < max(min_periods, 1)] = np.nan
+
+    return _lead(median.astype(x.dtype, copy=False), lead, out)
@@ -0,0 +1,1095 @@
+"""Solow residuals (i.e., technology) from the Penn World Tables.
+
+Data are held as 2-D (year x country) arrays rather than as a pandas
+Panel, and only the requested variables are ever materialized.
+
+"""
+import json
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy import optimize
+
+import pools
+import pwt_io
+import rolling
+
+# every variable that get_SolowResiduals knows how to compute
+variables = ('realGDP', 'laborForce', 'laborForceGrowth',
+             'smoothedLaborForceGrowth', 'investmentShare',
+             'smoothedInvestmentShare', 'imputedK', 'capitalOutputRatio',
+             'technology', 'technologyGrowth')
+
+class YearCountryPanel(object):
+    """Collection of 2-D (year x country) arrays sharing the same years
+    and countries.
+
+    """
+
+    def __init__(self, years, countries, dtype=np.float64):
+        self.years = np.asarray(years)
+        self.countries = np.asarray(countries)
+        self.dtype = np.dtype(dtype)
+        self.values = {}
+        self.load_stats = None
+
+    @property
+    def shape(self):
+        return (self.years.size, self.countries.size)
+
+    @classmethod
+    def from_frame(cls, frame, columns, dtype=np.float64):
+        """Pivots columns of a long DataFrame indexed by (year, isocode)
+        into year x country arrays.
+
+        """
+        return cls.from_columns(frame.index.get_level_values('year'),
+                                frame.index.get_level_values('isocode'),
+                                dict((c, frame[c].values) for c in columns),
+                                dtype)
+
+    @classmethod
+    def from_columns(cls, year, isocode, columns, dtype=np.float64):
+        """Pivots long 1-D arrays of year, isocode and values (a dictionary
+        of arrays, e.g., from pwt_io.load) into year x country arrays.
+
+        """
+        years, year_idx = np.unique(np.asarray(year), return_inverse=True)
+        countries, ctry_idx = np.unique(np.asarray(isocode),
+                                        return_inverse=True)
+
+        panel = cls(years, countries, dtype)
+        for name, values in columns.items():
+            array = panel.empty()
+            array.fill(np.nan)
+            array[year_idx, ctry_idx] = values
+            panel[name] = array
+
+        return panel
+
+    def empty(self):
+        """Returns an uninitialized year x country array."""
+        return np.empty(self.shape, dtype=self.dtype)
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def __getitem__(self, name):
+        """Returns variable name as a (year x country) DataFrame."""
+        return pd.DataFrame(self.values[name], index=self.years,
+                            columns=self.countries, copy=False)
+
+    def __setitem__(self, name, array):
+        array = np.asarray(array, dtype=self.dtype)
+        if array.shape != self.shape:
+            raise ValueError('%s has shape %s, expected %s!' %
+                             (name, array.shape, self.shape))
+        self.values[name] = array
+
+    def __delitem__(self, name):
+        del self.values[name]
+
+    def select(self, countries):
+        """Returns a new YearCountryPanel with only the given countries
+        (a sequence of isocodes).
+
+        """
+        countries = np.asarray(countries)
+        idx = np.searchsorted(self.countries, countries)
+        found = idx < self.countries.size
+        found[found] = self.countries[idx[found]] == countries[found]
+        if not np.all(found):
+            raise KeyError('Not in panel: %s' %
+                           ', '.join(str(c) for c in countries[~found]))
+        panel = YearCountryPanel(self.years, self.countries[idx], self.dtype)
+        for name, array in self.values.items():
+            panel[name] = array[:, idx]
+        return panel
+
+    @property
+    def items(self):
+        return sorted(self.values)
+
+def read_pwt(columns, path=None, version=71, date='11302012', cache=None,
+             dtype=np.float64, countries=None, years=None):
+    """Reads columns of the Penn World Tables into a YearCountryPanel,
+    either by streaming a local CSV at path or from the local PWT cache
+    (which downloads the appropriate zip file only once, see pwt_io).
+    Only the requested columns, countries (a sequence of isocodes) and
+    years (a (first, last) tuple) are kept.
+
+    When path is given, what was read is recorded in the load_stats
+    attribute of the result (see pwt_io.LoadStats).
+
+    """
+    # first check for a local copy of PWT
+    if path != None:
+        arrays, categories, stats = pwt_io.read_columns(
+            path, columns, dtype, countries=countries, years=years)
+        mask = np.ones(arrays['year'].shape, dtype=bool)
+
+    # otherwise, memory-map the cached columns
+    else:
+        arrays, categories = pwt_io.load(columns, version, date, cache)
+        stats = None
+        mask = np.ones(arrays['year'].shape, dtype=bool)
+        if countries is not None:
+            codes = [i for i, c in enumerate(categories['isocode'])
+                     if c in set(countries)]
+            mask &= np.in1d(arrays['isocode'], codes)
+        if years is not None:
+            mask &= (arrays['year'] >= years[0]) & (arrays['year'] <= years[1])
+
+    # rows without an isocode (code -1) have no column in the panel
+    mask &= arrays['isocode'] >= 0
+
+    isocode = np.asarray(categories['isocode'])[arrays['isocode'][mask]]
+    panel = YearCountryPanel.from_columns(
+        arrays['year'][mask], isocode,
+        dict((c, arrays[c][mask]) for c in columns), dtype)
+    panel.load_stats = stats
+    return panel
+
+def impute_capital(K0, s, y, delta, out=None):
+    """Imputes the capital stock using k_{t+1} = (1 - delta) k_t + s_t y_t.
+
+    The recurrence is scanned forward over years for all countries (and
+    parameter values) at once. Whenever k_t is NaN, k_{t+1} keeps its
+    initial estimate from K0, so each country starts from its first
+    non-NaN estimate.
+
+    Required arguments:
+
+        1. K0: (..., years, countries) array of initial capital estimates.
+        2. s: (years, countries) array of investment shares.
+        3. y: (years, countries) array of real GDP.
+        4. delta: Rate of capital depreciation. Either a scalar or an
+           array with the same number of dimensions as K0 (e.g., with
+           shape (P, 1, 1) for P parameter values).
+
+    Optional arguments:
+
+        1. out (default=None): Array in which to store the result. May
+           be K0 itself.
+
+    """
+    if out is None:
+        K = np.array(K0, dtype=float)
+    else:
+        K = out
+        K[...] = K0
+
+    # drop the year axis of delta so that it broadcasts against K[..., t, :]
+    delta = np.asarray(delta)
+    if delta.ndim == K.ndim:
+        delta = delta[..., 0, :]
+
+    for t in range(K.shape[-2] - 1): # no data beyond the final year
+        k = K[..., t, :]
+        np.copyto(K[..., t + 1, :], (1 - delta) * k + s[t] * y[t],
+                  where=~np.isnan(k))
+    return K
+
+def ffill(x, out=None):
+    """Forward fills NaNs down the years (i.e., the second to last axis)."""
+    years = np.arange(x.shape[-2])[:, np.newaxis]
+    rows = np.where(np.isnan(x), 0, years)
+    np.maximum.accumulate(rows, axis=-2, out=rows)
+    filled = np.take_along_axis(x, rows, axis=-2)
+    if out is None:
+        return filled
+    out[...] = filled
+    return out
+
+def pct_change(x, out=None):
+    """Growth rates down the years (i.e., the second to last axis). NaNs
+    are forward filled first, as in DataFrame.pct_change.
+
+    """
+    filled = ffill(x)
+    if out is None:
+        out = np.empty_like(filled)
+    out[..., 0, :] = np.nan
+    np.divide(filled[..., 1:, :], filled[..., :-1, :], out=out[..., 1:, :])
+    out[..., 1:, :] -= 1
+    return out
+
+def smooth(x, h, window=10, out=None):
+    """Rolling mean over window years (with at least h observations),
+    shifted back by h years (i.e., forward looking).
+
+    """
+    return rolling.rolling_mean(x, window, min_periods=h, lead=h, out=out)
+
+def _read(rgdppc, rgdppw, kwargs):
+    """Returns the PWT data needed by get_SolowResiduals (and friends) as a
+    YearCountryPanel, given their optional keyword arguments.
+
+    """
+    dtype = kwargs.get('dtype', np.float64)
+    pwt = kwargs.get('pwt', None)
+
+    columns = sorted(set([rgdppc, rgdppw, 'POP', 'ki']))
+    if pwt is None:
+        pwt = read_pwt(columns, kwargs.get('path', None),
+                       kwargs.get('version', 71),
+                       kwargs.get('date', '11302012'),
+                       kwargs.get('cache', None), dtype,
+                       kwargs.get('countries', None),
+                       kwargs.get('years', None))
+    elif not isinstance(pwt, YearCountryPanel):
+        pwt = YearCountryPanel.from_frame(pwt, columns, dtype)
+    return pwt
+
+def invariants(pwt, rgdppc, rgdppw, h=10, keep=()):
+    """Computes the parts of the Solow residuals that do not depend on g0,
+    delta or alpha: realGDP, investmentShare, the smoothed labor force
+    growth and investment shares, and outputPerWorker (i.e., rgdppw).
+
+    Required arguments:
+
+        1. pwt: YearCountryPanel with rgdppc, rgdppw, POP and ki.
+        2. rgdppc, rgdppw, h: See get_SolowResiduals.
+
+    Optional arguments:
+
+        1. keep (default=()): Names of other intermediates (i.e.,
+           laborForce and laborForceGrowth) to keep.
+
+    """
+    Ypc, Ypw = pwt.values[rgdppc], pwt.values[rgdppw]
+    POP, ki = pwt.values['POP'], pwt.values['ki']
+
+    results = YearCountryPanel(pwt.years, pwt.countries, pwt.dtype)
+    results['outputPerWorker'] = Ypw
+
+    # to compute Solow residuals need to a measure of real GDP...
+    results['realGDP'] = np.multiply(Ypc, POP, out=pwt.empty())
+
+    # ...and a measure of labor force growth rates (one reusable buffer)
+    buf = pwt.empty()
+    laborForce = np.divide(Ypc, Ypw, out=buf)
+    laborForce *= POP
+    if 'laborForce' in keep:
+        results['laborForce'] = laborForce.copy()
+    laborForceGrowth = pct_change(laborForce, out=pwt.empty())
+    if 'laborForceGrowth' in keep:
+        results['laborForceGrowth'] = laborForceGrowth.copy()
+
+    # annual growth rates are noisy, smooth them! Note backshift!
+    results['smoothedLaborForceGrowth'] = smooth(laborForceGrowth, h, out=buf)
+
+    # convert ki to proportion
+    results['investmentShare'] = np.divide(ki, 100., out=laborForceGrowth)
+
+    # investment shares are also noisy, smooth them! Note backshift!
+    results['smoothedInvestmentShare'] = \
+        smooth(results.values['investmentShare'], h)
+
+    return results
+
+def _parameter(value, dtype):
+    """Scalar parameters are left alone, (P,) arrays of parameters are
+    reshaped to (P, 1, 1) so that they broadcast against year x country
+    arrays, and (1, C) arrays of country specific parameters are left as
+    they are.
+
+    """
+    value = np.asarray(value, dtype=dtype)
+    if value.ndim == 0:
+        return value[()]
+    elif value.ndim == 1:
+        return value[:, np.newaxis, np.newaxis]
+    return value
+
+def _by_country(value, countries):
+    """Country specific parameters (a Series indexed by isocode, e.g., from
+    calibrate) as a (1, C) array aligned with countries. Anything else is
+    returned as is.
+
+    """
+    if isinstance(value, pd.Series):
+        return value.reindex(countries).values[np.newaxis, :]
+    return value
+
+def break_even_saving(inv, g0, delta):
+    """Saving rate that keeps capital per effective worker constant, i.e.,
+    (1 + n)(1 + g0) - (1 - delta), given invariants inv. g0 and delta are
+    scalars or (P,) arrays (in which case the result is (P, years,
+    countries)).
+
+    """
+    g0, delta = _parameter(g0, inv.dtype), _parameter(delta, inv.dtype)
+    # out of place, as either of g0 and delta may add the (P,) axis
+    s = (1 + inv.values['smoothedLaborForceGrowth']) * (1 + g0)
+    return (s - (1 - delta)).astype(inv.dtype, copy=False)
+
+def capital_stock(inv, g0, delta, break_even_s=None):
+    """Imputed capital stock given invariants inv (see break_even_saving).
+    If given, break_even_s is overwritten.
+
+    """
+    if break_even_s is None:
+        break_even_s = break_even_saving(inv, g0, delta)
+    realGDP = inv.values['realGDP']
+
+    # initial data on imputed K is just made up of K0 (and junk!)
+    K = np.divide(inv.values['smoothedInvestmentShare'], break_even_s,
+                  out=break_even_s)
+    K *= realGDP
+
+    # impute capital stock for all countries at once
+    return impute_capital(K, inv.values['investmentShare'], realGDP,
+                          _parameter(delta, inv.dtype), out=K)
+
+def technology(inv, capitalOutputRatio, alpha, out=None):
+    """Implied level of technology, y / (K / Y)^(alpha / (1 - alpha)), given
+    invariants inv. alpha is a scalar or a (P,) array.
+
+    """
+    alpha = _parameter(alpha, inv.dtype)
+    A = np.power(capitalOutputRatio, alpha / (1 - alpha), out=out)
+    np.divide(inv.values['outputPerWorker'], A, out=A)
+    return A
+
+def get_SolowResiduals(rgdppc, rgdppw, g0, delta, alpha, h=10, **kwargs):
+    """Computes Solow residuals!
+
+    Required arguments:
+
+        1. rgdppc: Must specify a valid measure of real gdp per capita.
+           Valid options are rgdpl, rgdpl2, rgdpch. See Penn World
+           Tables documentation for definitions of these variables.
+        2. rgdppw: Must specify a valid measure of real gdp per worker.
+           Valid options are rgdpwok, rgdpl2wok, rgdpl2pe, rgdpl2te.
+           See Penn World Tables documentation for definitions of
+           these variables.
+        3. g0: Initial guess for the growth rate of technology.
+           Required in order to pin down an initial estimate of the
+           capital stock.
+        4. delta: Estimated rate of capital decpreciation rate.
+           Required in order to compute the capital stock. May also be
+           a Series of country specific rates indexed by isocode.
+        5. alpha: Estimated share of income/output going to capital.
+           Required in order to decompose the growth rates in order to
+           impute A and g. May also be a Series of country specific
+           shares indexed by isocode (e.g., from calibrate).
+        6. h (default=10): Must specify the amount of smoothing to be
+           applied to computed growth rates (i.e., those of labor
+           force, investment share, and technology).
+
+    Optional keyword arguments:
+
+        1. path, version, date, cache, countries, years: See read_pwt.
+        2. pwt (default=None): DataFrame (indexed by year and isocode)
+           or YearCountryPanel of PWT data to use instead of reading it.
+        3. outputs (default=('technology', 'technologyGrowth')): Names
+           of the variables (see variables) to return.
+        4. dtype (default=np.float64): Storage type of the arrays. Use
+           np.float32 to halve memory.
+
+    Returns a YearCountryPanel containing only the requested outputs (and
+    the load_stats of the PWT read, see read_pwt).
+
+    """
+    # optional keywords args
+    outputs = kwargs.get('outputs', ('technology', 'technologyGrowth'))
+
+    unknown = set(outputs) - set(variables)
+    if unknown:
+        raise ValueError('Unknown outputs: %s' % ', '.join(sorted(unknown)))
+
+    pwt = _read(rgdppc, rgdppw, kwargs)
+    inv = invariants(pwt, rgdppc, rgdppw, h, keep=outputs)
+
+    results = YearCountryPanel(pwt.years, pwt.countries, pwt.dtype)
+    results.load_stats = pwt.load_stats
+    for name in outputs:
+        if name in inv:
+            results[name] = inv.values[name]
+
+    # country specific parameters (if any) line up with the countries
+    delta = _by_country(delta, pwt.countries)
+    alpha = _by_country(alpha, pwt.countries)
+
+    # impute capital stock
+    K = capital_stock(inv, g0, delta)
+    if 'imputedK' in outputs:
+        results['imputedK'] = K
+
+    # create capital-output ratio (in the same buffer unless K is kept)
+    capitalOutputRatio = np.divide(K, inv.values['realGDP'],
+                                   out=None if 'imputedK' in outputs else K)
+    if 'capitalOutputRatio' in outputs:
+        results['capitalOutputRatio'] = capitalOutputRatio.copy()
+
+    # compute the implied level of technology
+    A = technology(inv, capitalOutputRatio, alpha, out=capitalOutputRatio)
+    if 'technology' in outputs:
+        results['technology'] = A
+
+    # finally, compute the growth in technology
+    if 'technologyGrowth' in outputs:
+        results['technologyGrowth'] = pct_change(A)
+
+    return results
+
+# variables that sweep knows how to compute
+sweep_variables = ('breakEvenSaving', 'imputedK', 'capitalOutputRatio',
+                   'technology', 'technologyGrowth')
+
+class SweepResults(object):
+    """Results of sweep: a (G, years, countries) array for each output,
+    where G is the number of points on the parameter grid (see params).
+
+    """
+
+    def __init__(self, params, years, countries, values):
+        self.params = params
+        self.years = years
+        self.countries = countries
+        self.values = values
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def to_frame(self, name):
+        """Returns output name as a tidy DataFrame with one row per (g0,
+        delta, alpha, year, isocode) combination, dropping NaNs.
+
+        """
+        cube = self.values[name]
+        G, Y, C = cube.shape
+        point, year, ctry = np.unravel_index(np.arange(cube.size), cube.shape)
+        frame = pd.DataFrame({'g0': self.params['g0'].values[point],
+                              'delta': self.params['delta'].values[point],
+                              'alpha': self.params['alpha'].values[point],
+                              'year': self.years[year],
+                              'isocode': self.countries[ctry],
+                              name: cube.ravel()},
+                             columns=['g0', 'delta', 'alpha', 'year',
+                                      'isocode', name])
+        return frame[np.isfinite(frame[name].values)]
+
+def _sweep_chunk(args):
+    """Computes the sweep outputs for a chunk of grid points."""
+    inv, g0, delta, alpha, outputs = args
+
+    # capital only depends on the unique (g0, delta) pairs in the chunk
+    pairs, pair_idx = np.unique(np.column_stack([g0, delta]), axis=0,
+                                return_inverse=True)
+    pair_idx = pair_idx.ravel()
+
+    results = {}
+    break_even_s = break_even_saving(inv, pairs[:, 0], pairs[:, 1])
+    if 'breakEvenSaving' in outputs:
+        results['breakEvenSaving'] = break_even_s[pair_idx]
+
+    K = capital_stock(inv, pairs[:, 0], pairs[:, 1], break_even_s)
+    if 'imputedK' in outputs:
+        results['imputedK'] = K[pair_idx]
+
+    capitalOutputRatio = np.divide(K, inv.values['realGDP'], out=K)
+    if 'capitalOutputRatio' in outputs:
+        results['capitalOutputRatio'] = capitalOutputRatio[pair_idx]
+
+    if 'technology' in outputs or 'technologyGrowth' in outputs:
+        A = technology(inv, capitalOutputRatio[pair_idx], alpha)
+        if 'technology' in outputs:
+            results['technology'] = A
+        if 'technologyGrowth' in outputs:
+            results['technologyGrowth'] = pct_change(A)
+
+    return results
+
+def sweep(rgdppc, rgdppw, g0, delta, alpha, h=10, **kwargs):
+    """Computes Solow residuals for a whole grid of (g0, delta, alpha).
+
+    PWT is read, and the parameter independent parts (see invariants)
+    computed, only once. The imputed capital stock is computed once for
+    each unique (g0, delta) pair with the parameters as an extra array
+    axis, and technology for each grid point from those.
+
+    Required arguments:
+
+        1. rgdppc, rgdppw, h: See get_SolowResiduals.
+        2. g0, delta, alpha: Sequences of parameter values.
+
+    Optional keyword arguments:
+
+        1. grid (default=True): If True, sweep over every combination
+           of g0, delta and alpha. Otherwise, g0, delta and alpha must
+           have the same length and are zipped together.
+        2. outputs (default=('technology', 'technologyGrowth')): Names
+           of the variables (see sweep_variables) to return.
+        3. processes (default=1): Number of worker processes.
+        4. chunksize (default=64): Number of grid points per task.
+        5. path, version, date, cache, pwt, dtype: See get_SolowResiduals.
+
+    Returns a SweepResults object.
+
+    """
+    grid      = kwargs.get('grid', True)
+    outputs   = kwargs.get('outputs', ('technology', 'technologyGrowth'))
+    processes = kwargs.get('processes', 1)
+    chunksize = kwargs.get('chunksize', 64)
+
+    unknown = set(outputs) - set(sweep_variables)
+    if unknown:
+        raise ValueError('Unknown outputs: %s' % ', '.join(sorted(unknown)))
+
+    if grid == True:
+        g0, delta, alpha = [a.ravel() for a in
+                            np.meshgrid(g0, delta, alpha, indexing='ij')]
+    else:
+        g0, delta, alpha = np.asarray(g0), np.asarray(delta), np.asarray(alpha)
+        if not g0.shape == delta.shape == alpha.shape:
+            raise ValueError('g0, delta and alpha must have the same length!')
+    params = pd.DataFrame({'g0': g0, 'delta': delta, 'alpha': alpha},
+                          columns=['g0', 'delta', 'alpha'])
+
+    pwt = _read(rgdppc, rgdppw, kwargs)
+    inv = invariants(pwt, rgdppc, rgdppw, h)
+
+    # chunks of grid points that share (g0, delta) pairs as far as possible
+    order = np.lexsort((alpha, delta, g0))
+    chunks = [order[i:i + chunksize] for i in range(0, order.size, chunksize)]
+    tasks = [(inv, g0[idx], delta[idx], alpha[idx], outputs)
+             for idx in chunks]
+
+    if processes == 1 or len(tasks) == 1:
+        shards = [_sweep_chunk(task) for task in tasks]
+    else:
+        pool = pools.pool(processes)
+        try:
+            shards = pool.map(_sweep_chunk, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    values = {}
+    for name in outputs:
+        values[name] = np.empty((order.size,) + pwt.shape, dtype=pwt.dtype)
+        for idx, shard in zip(chunks, shards):
+            values[name][idx] = shard[name]
+
+    return SweepResults(params, pwt.years, pwt.countries, values)
+
+class IncrementalResiduals(object):
+    """Solow residuals that can be extended with new years (or countries)
+    of PWT data without recomputing everything from year zero.
+
+    Besides the outputs, only the state needed to continue is kept: the
+    last window + h (or so) years of raw data and imputed capital, which
+    cover the rolling windows, the forward shift by h and the capital
+    recurrence, plus the last (forward filled) labor force and technology
+    before those years, which seed the growth rates. Extending the
+    residuals by m years then costs O(m + window + h) years of work, and
+    the results match a full recompute with get_SolowResiduals.
+
+    """
+
+    outputs = ('imputedK', 'capitalOutputRatio', 'technology',
+               'technologyGrowth')
+
+    def __init__(self, rgdppc, rgdppw, g0, delta, alpha, h=10, window=10,
+                 dtype=np.float64):
+        """Required arguments:
+
+            1. rgdppc, rgdppw, g0, delta, alpha, h: See get_SolowResiduals.
+
+        Optional arguments:
+
+            1. window (default=10): Length of the rolling windows.
+            2. dtype (default=np.float64): Storage type of the arrays.
+
+        """
+        self.rgdppc, self.rgdppw = rgdppc, rgdppw
+        self.g0, self.delta, self.alpha = g0, delta, alpha
+        self.h, self.window = h, window
+        self.dtype = np.dtype(dtype)
+        self._reset(np.empty(0, dtype=object))
+
+    def _reset(self, countries):
+        """Empty state for countries."""
+        C = len(countries)
+        self.years = np.empty(0, dtype=np.int64)
+        self.countries = np.asarray(countries, dtype=object)
+        self._results = dict((name, np.empty((0, C), self.dtype))
+                             for name in self.outputs)
+        self._tail = dict((name, np.empty((0, C), self.dtype))
+                          for name in ('Ypc', 'Ypw', 'POP', 'ki', 'imputedK'))
+        self._seeds = dict((name, np.nan * np.ones(C, self.dtype))
+                           for name in ('laborForce', 'technology'))
+
+    @property
+    def tail_length(self):
+        """Number of years of raw data needed to continue."""
+        return max(self.window - self.h, 1) + 1 + self.h
+
+    def panel(self):
+        """Returns the outputs as a YearCountryPanel."""
+        results = YearCountryPanel(self.years, self.countries, self.dtype)
+        for name in self.outputs:
+            results[name] = self._results[name][:self.years.size]
+        return results
+
+    def _raw(self, pwt):
+        """Raw inputs of pwt (a YearCountryPanel) by their internal names."""
+        return {'Ypc': pwt.values[self.rgdppc], 'Ypw': pwt.values[self.rgdppw],
+                'POP': pwt.values['POP'], 'ki': pwt.values['ki']}
+
+    def _reserve(self, rows):
+        """Makes sure that the outputs have room for rows years (capacity
+        doubles, so appending is amortized O(new data)).
+
+        """
+        Y = self.years.size
+        for name, array in self._results.items():
+            if array.shape[0] < rows:
+                grown = np.empty((max(2 * array.shape[0], rows),
+                                  array.shape[1]), self.dtype)
+                grown[:Y] = array[:Y]
+                self._results[name] = grown
+
+    def _extend(self, raw, new_years):
+        """Appends new_years of raw data (dictionary of (m, C) arrays for
+        the current countries) and recomputes only the affected years.
+
+        """
+        m, Y = len(new_years), self.years.size
+        L = self._tail['Ypc'].shape[0]
+
+        # outputs of the last h years change (the smoothing looks ahead)
+        first = max(L - self.h, 0)
+
+        block = dict((k, np.concatenate([self._tail[k], raw[k]]).astype(
+                      self.dtype)) for k in ('Ypc', 'Ypw', 'POP', 'ki'))
+        realGDP = block['Ypc'] * block['POP']
+
+        # labor force growth, seeded with the last labor force before block
+        laborForce = np.vstack([self._seeds['laborForce'],
+                                block['Ypc'] / block['Ypw'] * block['POP']])
+        laborForceGrowth = pct_change(laborForce)[1:]
+        smoothedLaborForceGrowth = smooth(laborForceGrowth, self.h,
+                                          self.window)
+
+        investmentShare = block['ki'] / 100.
+        smoothedInvestmentShare = smooth(investmentShare, self.h, self.window)
+
+        # initial estimates of K from first on, continue the recurrence
+        K = (smoothedInvestmentShare /
+             ((1 + smoothedLaborForceGrowth) * (1 + self.g0) -
+              (1 - self.delta))) * realGDP
+        K[:first] = self._tail['imputedK'][:first]
+        start = max(first - 1, 0)
+        impute_capital(K[start:], investmentShare[start:], realGDP[start:],
+                       self.delta, out=K[start:])
+
+        capitalOutputRatio = K / realGDP
+        A = block['Ypw'] / capitalOutputRatio**(self.alpha / (1 - self.alpha))
+        A = np.vstack([self._seeds['technology'], A])
+        technologyGrowth = pct_change(A)[1:]
+
+        # write the affected years of the outputs
+        self._reserve(Y + m)
+        offset = Y - L
+        for name, values in zip(self.outputs, (K, capitalOutputRatio, A[1:],
+                                               technologyGrowth)):
+            self._results[name][offset + first:Y + m] = values[first:]
+
+        # roll the state forward
+        R = L + m
+        s0 = R - min(self.tail_length, R)
+        for k in ('Ypc', 'Ypw', 'POP', 'ki'):
+            self._tail[k] = block[k][s0:].copy()
+        self._tail['imputedK'] = K[s0:].copy()
+        self._seeds['laborForce'] = ffill(laborForce)[s0].copy()
+        self._seeds['technology'] = ffill(A)[s0].copy()
+        self.years = np.concatenate([self.years, new_years])
+
+    def update(self, pwt):
+        """Adds new years and/or new countries of PWT data.
+
+        Required arguments:
+
+            1. pwt: DataFrame (indexed by year and isocode) or
+               YearCountryPanel. Existing countries may only gain years
+               after the last year seen so far; new countries may come
+               with their full history.
+
+        Returns self.
+
+        """
+        columns = sorted(set([self.rgdppc, self.rgdppw, 'POP', 'ki']))
+        if not isinstance(pwt, YearCountryPanel):
+            pwt = YearCountryPanel.from_frame(pwt, columns, self.dtype)
+        raw = self._raw(pwt)
+
+        old = np.in1d(pwt.countries, self.countries)
+        if self.years.size > 0:
+            revised = pwt.years <= self.years[-1]
+            for values in raw.values():
+                if np.any(~np.isnan(values[np.ix_(revised, old)])):
+                    raise ValueError('Revisions to years that have already ' +
+                                     'been seen are not supported!')
+
+        # first, extend the existing countries with the new years
+        if self.countries.size > 0 and self.years.size > 0:
+            new_years = pwt.years[pwt.years > self.years[-1]]
+            if new_years.size > 0:
+                aligned = dict((k, _reindex(v, pwt.years, pwt.countries,
+                                            new_years, self.countries))
+                               for k, v in raw.items())
+                self._extend(aligned, new_years)
+
+        # second, compute any new countries from scratch...
+        if np.all(old):
+            return self
+        years = np.union1d(self.years, pwt.years)
+        fresh = IncrementalResiduals(self.rgdppc, self.rgdppw, self.g0,
+                                     self.delta, self.alpha, self.h,
+                                     self.window, self.dtype)
+        fresh._reset(pwt.countries[~old])
+        fresh._extend(dict((k, _reindex(v, pwt.years, pwt.countries, years,
+                                        fresh.countries))
+                           for k, v in raw.items()), years)
+
+        # ...and merge them in
+        if self.countries.size == 0:
+            self.__dict__.update(fresh.__dict__)
+        else:
+            self._merge(fresh)
+        return self
+
+    def _merge(self, other):
+        """Merges in the (disjoint) countries of other, which covers the
+        same or more years.
+
+        """
+        years = other.years
+        countries = np.concatenate([self.countries, other.countries])
+        order = np.argsort(countries)
+
+        for name in self.outputs:
+            mine = _reindex(self._results[name][:self.years.size], self.years,
+                            self.countries, years, self.countries)
+            self._results[name] = np.hstack([mine,
+                other._results[name][:years.size]])[:, order]
+
+        # prepended years are all NaN, so pad the shorter tail with NaNs
+        for name in self._tail:
+            mine, theirs = self._tail[name], other._tail[name]
+            rows = max(mine.shape[0], theirs.shape[0])
+            self._tail[name] = np.hstack([_pad(mine, rows), _pad(theirs, rows)]
+                                         )[:, order]
+        for name in self._seeds:
+            self._seeds[name] = np.concatenate([self._seeds[name],
+                                                other._seeds[name]])[order]
+
+        self.years = years
+        self.countries = countries[order]
+
+    def save(self, path):
+        """Saves the outputs and the state needed to continue to path (an
+        .npz file).
+
+        """
+        arrays = {'years': self.years,
+                  'countries': self.countries.astype(str)}
+        for name in self.outputs:
+            arrays['results_' + name] = self._results[name][:self.years.size]
+        for name, values in self._tail.items():
+            arrays['tail_' + name] = values
+        for name, values in self._seeds.items():
+            arrays['seed_' + name] = values
+        params = [self.rgdppc, self.rgdppw, self.g0, self.delta, self.alpha,
+                  self.h, self.window, self.dtype.str]
+        arrays['params'] = np.array(json.dumps(params))
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Loads residuals (and their state) saved with save."""
+        data = np.load(path)
+        params = json.loads(str(data['params']))
+        self = cls(*params)
+        self.years = data['years']
+        self.countries = data['countries'].astype(object)
+        for name in self.outputs:
+            self._results[name] = data['results_' + name]
+        for name in self._tail:
+            self._tail[name] = data['tail_' + name]
+        for name in self._seeds:
+            self._seeds[name] = data['seed_' + name]
+        return self
+
+def _reindex(array, years, countries, new_years, new_countries):
+    """Reindexes a year x country array, filling gaps with NaNs."""
+    frame = pd.DataFrame(array, index=years, columns=countries)
+    return frame.reindex(index=new_years, columns=new_countries).values
+
+def _pad(array, rows):
+    """Pads array with rows of NaNs at the top to a total of rows rows."""
+    padding = np.nan * np.ones((rows - array.shape[0], array.shape[1]),
+                               array.dtype)
+    return np.vstack([padding, array])
+
+# simulated paths (per worker) and steady states (per effective worker)
+SolowPaths = namedtuple('SolowPaths', ['k', 'y', 'A', 'k_star', 'y_star',
+                                       'speed', 'half_life'])
+
+def initial_state(results, year=None):
+    """Capital per worker, k = K / L, and technology, A, of every country
+    in a given year, from a YearCountryPanel returned by
+    get_SolowResiduals with outputs including imputedK, laborForce and
+    technology.
+
+    Optional arguments:
+
+        1. year (default=None): Year of the initial state. Default is
+           the last year (i.e., 2010 for PWT 7.1).
+
+    Returns a tuple (countries, k0, A0). Countries with missing data are
+    dropped.
+
+    """
+    if year is None:
+        row = -1
+    else:
+        row = np.searchsorted(results.years, year)
+        if row == results.years.size or results.years[row] != year:
+            raise KeyError('No data for %s (years are %s to %s)!' %
+                           (year, results.years[0], results.years[-1]))
+    k0 = results.values['imputedK'][row] / results.values['laborForce'][row]
+    A0 = results.values['technology'][row]
+    valid = np.isfinite(k0) & np.isfinite(A0)
+    return results.countries[valid], k0[valid], A0[valid]
+
+def _scenario(value):
+    """Scenario parameters are scalars, (S,) arrays (reshaped to (S, 1))
+    or (S, C) arrays of country specific values.
+
+    """
+    value = np.asarray(value, dtype=float)
+    if value.ndim == 1:
+        return value[:, np.newaxis]
+    return value
+
+def simulate(k0, A0, s, n, g, delta, alpha, horizon=50):
+    """Simulates the Solow model forward for every country under every
+    scenario at once.
+
+    Capital per worker follows (1 + n) k_{t+1} = (1 - delta) k_t + s y_t,
+    where y_t = k_t^alpha A_t^(1 - alpha) and A_{t+1} = (1 + g) A_t (i.e.,
+    the same law of motion used to impute K in get_SolowResiduals).
+
+    Required arguments:
+
+        1. k0: (C,) array of initial capital per worker.
+        2. A0: (C,) array of initial technology.
+        3. s, n, g, delta: Saving rates, labor force growth rates,
+           technology growth rates and depreciation rates. Each is a
+           scalar, an (S,) array (one value per scenario) or an (S, C)
+           array (scenario and country specific values).
+        4. alpha: Capital share (scalar, (S,) or (S, C)).
+
+    Optional arguments:
+
+        1. horizon (default=50): Number of years to simulate.
+
+    Returns a SolowPaths object where k, y and A are (S, horizon + 1, C)
+    arrays, k_star and y_star are steady state capital and output per
+    effective worker, speed is the fraction of the gap to the steady
+    state closed each year (near the steady state) and half_life is the
+    number of years needed to close half of it. The last four are (S, C)
+    arrays.
+
+    """
+    s, n, g = _scenario(s), _scenario(n), _scenario(g)
+    delta, alpha = _scenario(delta), _scenario(alpha)
+    k0, A0 = np.asarray(k0, dtype=float), np.asarray(A0, dtype=float)
+
+    S = np.broadcast(np.atleast_2d(s), np.atleast_2d(n), np.atleast_2d(g),
+                     np.atleast_2d(delta), np.atleast_2d(alpha)).shape[0]
+    shape = (S, horizon + 1, k0.size)
+
+    # technology grows at a constant rate
+    growth = np.broadcast_to(1 + g, (S, k0.size))[:, np.newaxis, :]
+    t = np.arange(horizon + 1)[:, np.newaxis]
+    A = A0 * growth**t
+
+    # capital accumulation, vectorized across scenarios and countries
+    k, y = np.empty(shape), np.empty(shape)
+    k[:, 0] = k0
+    for i in range(horizon + 1):
+        y[:, i] = k[:, i]**alpha * A[:, i]**(1 - alpha)
+        if i < horizon:
+            k[:, i + 1] = ((1 - delta) * k[:, i] + s * y[:, i]) / (1 + n)
+
+    # steady state and speed of convergence (per effective worker)
+    break_even_s = (1 + n) * (1 + g) - (1 - delta)
+    ones = np.ones((S, k0.size))
+    k_star = (s / break_even_s)**(1 / (1 - alpha)) * ones
+    y_star = k_star**alpha
+    slope = ((1 - delta) + alpha * break_even_s) / ((1 + n) * (1 + g))
+    speed = (1 - slope) * ones
+    half_life = np.log(0.5) / np.log(slope) * ones
+
+    return SolowPaths(k, y, A, k_star, y_star, speed, half_life)
+
+def _nanmean(x, axis):
+    """Mean ignoring NaNs (and infinities), NaN if there are none."""
+    x = np.where(np.isfinite(x), x, np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # all-NaN slices
+        return np.nanmean(x, axis=axis)
+
+def calibration_loss(inv, g0, alpha, delta, loss='smoothness', target=None):
+    """Calibration loss of every country, evaluated for all countries (and
+    parameter values) at once.
+
+    Required arguments:
+
+        1. inv: Invariants (see invariants).
+        2. g0: See get_SolowResiduals.
+        3. alpha, delta: Scalars, (P,) arrays (the result is then
+           (P, C)) or (1, C) arrays of country specific values.
+
+    Optional arguments:
+
+        1. loss (default='smoothness'): Either 'smoothness', the mean
+           squared year on year change in technology growth, or
+           'capital_output', the mean squared log difference between
+           imputed and observed (target) capital-output ratios.
+        2. target (default=None): (years, countries) array of observed
+           capital-output ratios (required for loss='capital_output').
+
+    """
+    K = capital_stock(inv, g0, delta)
+    capitalOutputRatio = np.divide(K, inv.values['realGDP'], out=K)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if loss == 'capital_output':
+            error = np.log(capitalOutputRatio) - np.log(target)
+            return _nanmean(error**2, axis=-2)
+        elif loss == 'smoothness':
+            A = technology(inv, capitalOutputRatio, alpha,
+                           out=capitalOutputRatio)
+            return _nanmean(np.diff(pct_change(A), axis=-2)**2, axis=-2)
+        else:
+            raise ValueError("loss must be 'smoothness' or 'capital_output'!")
+
+def _refine(args):
+    """Minimizes the calibration loss of a single country."""
+    inv, g0, loss, target, x0, bounds = args
+
+    # the capital-output loss does not depend on alpha, so only delta is free
+    free = slice(1, 2) if loss == 'capital_output' else slice(0, 2)
+    params = np.array(x0, dtype=np.float64)
+
+    def objective(x):
+        params[free] = x
+        value = calibration_loss(inv, g0, np.array([[params[0]]]),
+                                 np.array([[params[1]]]), loss, target)[..., 0]
+        return float(value) if np.isfinite(value) else 1e10
+
+    result = optimize.minimize(objective, params[free], method='L-BFGS-B',
+                               bounds=bounds[free])
+    params[free] = result.x
+    return params[0], params[1], result.fun, result.success
+
+def calibrate(rgdppc, rgdppw, g0, h=10, **kwargs):
+    """Estimates country specific alpha and delta by minimizing a
+    calibration loss (see calibration_loss) for each country.
+
+    A coarse grid of (alpha, delta) is first evaluated for all countries
+    at once. Each country's best grid point then seeds an independent,
+    bounded optimization, and these optimizations are spread over a
+    process pool.
+
+    With loss='capital_output' the loss does not depend on alpha, so only
+    delta is calibrated and the alpha column is just the alpha passed in
+    (NaN if none is given).
+
+    Required arguments:
+
+        1. rgdppc, rgdppw, g0, h: See get_SolowResiduals.
+
+    Optional keyword arguments:
+
+        1. loss (default='smoothness'), target (default=None): See
+           calibration_loss. target may also be a DataFrame (years x
+           isocodes).
+        2. alpha_grid (default=np.linspace(0.2, 0.6, 9)): Grid of alpha.
+        3. delta_grid (default=np.linspace(0.02, 0.1, 9)): Grid of delta.
+        4. bounds (default=((0.05, 0.95), (0.0, 0.25))): Bounds on alpha
+           and delta.
+        5. processes (default=None): Number of worker processes. None
+           uses every core, 1 optimizes in the current process.
+        6. alpha (default=None): Scalar or Series (indexed by isocode)
+           of alpha to report with loss='capital_output'.
+        7. path, version, date, cache, countries, years, pwt, dtype:
+           See get_SolowResiduals.
+
+    Returns a DataFrame indexed by isocode with columns alpha, delta,
+    loss and converged. Its alpha and delta columns can be passed
+    straight back to get_SolowResiduals.
+
+    """
+    loss       = kwargs.get('loss', 'smoothness')
+    target     = kwargs.get('target', None)
+    alpha_grid = kwargs.get('alpha_grid', np.linspace(0.2, 0.6, 9))
+    delta_grid = kwargs.get('delta_grid', np.linspace(0.02, 0.1, 9))
+    bounds     = kwargs.get('bounds', ((0.05, 0.95), (0.0, 0.25)))
+    processes  = kwargs.get('processes', None)
+    alpha      = kwargs.get('alpha', None)
+
+    pwt = _read(rgdppc, rgdppw, kwargs)
+    inv = invariants(pwt, rgdppc, rgdppw, h)
+    if isinstance(target, pd.DataFrame):
+        target = target.reindex(index=pwt.years, columns=pwt.countries).values
+
+    if loss == 'capital_output':
+        if target is None:
+            raise ValueError("loss='capital_output' requires a target!")
+        alpha_grid = [np.nan]
+
+    # coarse grid, evaluated for every country at once (in chunks)
+    alphas, deltas = [a.ravel() for a in np.meshgrid(alpha_grid, delta_grid)]
+    losses = np.vstack([calibration_loss(inv, g0, alphas[i:i + 16],
+                                         deltas[i:i + 16], loss, target)
+                        for i in range(0, alphas.size, 16)])
+    feasible = np.any(np.isfinite(losses), axis=0)
+    best = np.argmin(np.where(np.isfinite(losses), losses, np.inf), axis=0)
+
+    # refine each country independently
+    countries = pwt.countries[feasible]
+    tasks = []
+    for ctry, i in zip(countries, best[feasible]):
+        col = np.searchsorted(pwt.countries, ctry)
+        tasks.append((inv.select([ctry]), g0, loss,
+                      None if target is None else target[:, [col]],
+                      (alphas[i], deltas[i]), bounds))
+
+    if processes == 1 or len(tasks) <= 1:
+        fits = [_refine(task) for task in tasks]
+    else:
+        pool = pools.pool(processes)
+        try:
+            fits = pool.map(_refine, tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+    table = pd.DataFrame(fits, index=pd.Index(countries, name='isocode'),
+                         columns=['alpha', 'delta', 'loss', 'converged'])
+    table = table.reindex(pwt.countries)
+    if loss == 'capital_output':
+        if isinstance(alpha, pd.Series):
+            table['alpha'] = alpha.reindex(table.index)
+        else:
+            table['alpha'] = np.nan if alpha is None else alpha
+    return table
@@ -0,0 +1,296 @@
+"""Cross-country statistics on the output of solow.get_SolowResiduals.
+
+Everything works on the precomputed year x country matrices using index
+arrays, so resampling never re-runs get_SolowResiduals.
+
+"""
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+def _columns(countries, members):
+    """Column indices of the members of a group that are in countries."""
+    members = np.intersect1d(np.asarray(members, dtype=object).astype(str),
+                             np.asarray(countries).astype(str))
+    return np.searchsorted(np.asarray(countries).astype(str), members)
+
+def _reduce(x, axis, statistic):
+    """NaN-aware mean or median of x along axis."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # all-NaN slices
+        if statistic == 'mean':
+            return np.nanmean(x, axis=axis)
+        elif statistic == 'median':
+            return np.nanmedian(x, axis=axis)
+        else:
+            raise ValueError("statistic must be 'mean' or 'median'!")
+
+def _percentiles(draws, q):
+    """Percentiles (along the first axis) of bootstrap draws."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanpercentile(draws, q, axis=0)
+
+def bootstrap_by_year(data, groups, variable='technologyGrowth', n=2000,
+                      q=(2.5, 50, 97.5), statistic='mean', seed=None,
+                      chunksize=250):
+    """Bootstrap percentile bands for the cross-country mean (or median) of
+    variable in each year, resampling countries within each group.
+
+    Required arguments:
+
+        1. data: YearCountryPanel (e.g., from solow.get_SolowResiduals).
+        2. groups: Dictionary mapping group names (e.g., 'LIC') to
+           sequences of isocodes.
+
+    Optional arguments:
+
+        1. variable (default='technologyGrowth'): Variable in data.
+        2. n (default=2000): Number of bootstrap resamples.
+        3. q (default=(2.5, 50, 97.5)): Percentiles to return.
+        4. statistic (default='mean'): 'mean' or 'median'.
+        5. seed (default=None): Seed for the resampling.
+        6. chunksize (default=250): Resamples per vectorized batch.
+
+    Returns a dictionary mapping group names to DataFrames indexed by
+    year with one column per percentile.
+
+    """
+    X = data.values[variable]
+    prng = np.random.RandomState(seed)
+
+    bands = {}
+    for name, members in sorted(groups.items()):
+        cols = _columns(data.countries, members)
+        if cols.size == 0:
+            continue
+
+        draws = np.empty((n, X.shape[0]))
+        for start in range(0, n, chunksize):
+            size = min(chunksize, n - start)
+            idx = cols[prng.randint(0, cols.size, (size, cols.size))]
+
+            # one gather: (years, resamples, countries)
+            draws[start:start + size] = _reduce(X[:, idx], -1, statistic).T
+
+        bands[name] = pd.DataFrame(_percentiles(draws, q).T, index=data.years,
+                                   columns=list(q))
+    return bands
+
+def bootstrap_period(data, groups, variable='technologyGrowth', n=2000,
+                     block=5, countries=True, q=(2.5, 50, 97.5),
+                     statistic='mean', seed=None, chunksize=250):
+    """Bootstrap percentile bands for the mean (or median) of variable over
+    all years and countries in each group, using a moving block bootstrap
+    over years and (optionally) resampling countries within groups.
+
+    Required arguments:
+
+        1. data, groups: See bootstrap_by_year.
+
+    Optional arguments:
+
+        1. block (default=5): Length of the blocks of years (blocks
+           preserve the serial correlation of the growth rates).
+        2. countries (default=True): Whether to also resample countries
+           within each group.
+        3. variable, n, q, statistic, seed, chunksize: See
+           bootstrap_by_year.
+
+    Returns a DataFrame indexed by group with one column per percentile.
+
+    """
+    X = data.values[variable]
+    Y = X.shape[0]
+    block = min(block, Y)
+    n_blocks = -(-Y // block)
+    prng = np.random.RandomState(seed)
+
+    rows = []
+    for name, members in sorted(groups.items()):
+        cols = _columns(data.countries, members)
+        if cols.size == 0:
+            continue
+
+        draws = np.empty(n)
+        for start in range(0, n, chunksize):
+            size = min(chunksize, n - start)
+
+            # resampled years: (resamples, Y) built from random blocks
+            starts = prng.randint(0, Y - block + 1, (size, n_blocks))
+            years = (starts[:, :, np.newaxis] + np.arange(block)
+                     ).reshape(size, -1)[:, :Y]
+
+            # resampled countries: (resamples, countries)
+            if countries == True:
+                ctrys = cols[prng.randint(0, cols.size, (size, cols.size))]
+            else:
+                ctrys = np.tile(cols, (size, 1))
+
+            sample = X[years[:, :, np.newaxis], ctrys[:, np.newaxis, :]]
+            draws[start:start + size] = _reduce(
+                sample.reshape(size, -1), -1, statistic)
+
+        rows.append(pd.Series(_percentiles(draws, q), index=list(q),
+                              name=name))
+    return pd.DataFrame(rows)
+
+# estimates from ols, one entry (or row) per specification
+Regression = namedtuple('Regression', ['coef', 'se', 'nobs', 'r2'])
+
+def ols(X, y, mask=None, hc='HC1'):
+    """Solves a batch of least squares problems at once, with
+    heteroskedasticity robust standard errors.
+
+    Required arguments:
+
+        1. X: (S, N, K) array of design matrices, one per specification.
+        2. y: (S, N) array of dependent variables.
+
+    Optional arguments:
+
+        1. mask (default=None): (S, N) boolean array of the observations
+           to use in each specification. Observations with NaNs in X or
+           y are always dropped.
+        2. hc (default='HC1'): 'HC0' or 'HC1' robust standard errors.
+
+    Specifications with too few observations (or collinear regressors)
+    come back as NaNs. Returns a Regression of (S, K) coef and se and
+    (S,) nobs and r2.
+
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    S, N, K = X.shape
+
+    valid = np.isfinite(y) & np.isfinite(X).all(axis=-1)
+    if mask is not None:
+        valid &= np.asarray(mask, dtype=bool)
+
+    # dropped observations become rows of zeros
+    X = np.where(valid[:, :, np.newaxis], X, 0)
+    y = np.where(valid, y, 0)
+    nobs = valid.sum(axis=1)
+
+    XtX = np.einsum('snk,snl->skl', X, X)
+    Xty = np.einsum('snk,sn->sk', X, y)
+    bread = np.linalg.pinv(XtX)
+    coef = np.einsum('skl,sl->sk', bread, Xty)
+
+    resid = np.where(valid, y - np.einsum('snk,sk->sn', X, coef), 0)
+    meat = np.einsum('snk,sn,snl->skl', X, resid**2, X)
+    V = np.einsum('skl,slm,smn->skn', bread, meat, bread)
+
+    dof = nobs - K
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if hc == 'HC1':
+            V *= (nobs / dof)[:, np.newaxis, np.newaxis]
+        elif hc != 'HC0':
+            raise ValueError("hc must be 'HC0' or 'HC1'!")
+        se = np.sqrt(np.diagonal(V, axis1=1, axis2=2))
+
+        ybar = y.sum(axis=1) / nobs
+        tss = (np.where(valid, y - ybar[:, np.newaxis], 0)**2).sum(axis=1)
+        r2 = 1 - (resid**2).sum(axis=1) / tss
+
+    # too few observations or collinear regressors
+    bad = (dof <= 0) | (np.linalg.matrix_rank(XtX) < K)
+    coef[bad], se[bad], r2[bad] = np.nan, np.nan, np.nan
+    return Regression(coef, se, nobs, r2)
+
+# regressors (after the constant) of each kind of regression
+regression_terms = {'beta': ('initialOutput',),
+                    'technology': ('initialOutput',)}
+
+def _specifications(data, groups, starts, windows):
+    """(group, start, window) triples with both ends in data.years, along
+    with index arrays of their first and last years and group masks.
+
+    """
+    if groups is None:
+        groups = {'All': data.countries}
+    masks = {}
+    for name, members in groups.items():
+        masks[name] = np.zeros(data.countries.size, dtype=bool)
+        masks[name][_columns(data.countries, members)] = True
+
+    specs, first, last = [], [], []
+    for name in sorted(masks):
+        for start in starts:
+            for window in windows:
+                i0 = np.searchsorted(data.years, start)
+                i1 = np.searchsorted(data.years, start + window)
+                if (i0 < data.years.size and data.years[i0] == start and
+                    i1 < data.years.size and data.years[i1] == start + window):
+                    specs.append((name, start, window))
+                    first.append(i0)
+                    last.append(i1)
+
+    mask = np.array([masks[name] for name, _, _ in specs], dtype=bool)
+    return specs, np.array(first, dtype=int), np.array(last, dtype=int), mask
+
+def convergence(data, groups=None, starts=(1960,), windows=(40,),
+                kind='beta', hc='HC1'):
+    """Cross-country convergence regressions for every combination of
+    income group, start year and window length, estimated in one batched
+    call to ols.
+
+    Required arguments:
+
+        1. data: YearCountryPanel from solow.get_SolowResiduals with (at
+           least) outputs realGDP and laborForce, plus technology if
+           kind='technology'.
+
+    Optional arguments:
+
+        1. groups (default=None): Dictionary mapping group names to
+           sequences of isocodes. None puts every country in group 'All'.
+        2. starts (default=(1960,)): Start years.
+        3. windows (default=(40,)): Window lengths (in years).
+        4. kind (default='beta'): Either 'beta', which regresses the
+           average growth rate of output per worker on its initial (log)
+           level, or 'technology', which regresses the average growth
+           rate of technology on the initial (log) level of output per
+           worker (i.e., technological catch-up). Growth accounting is
+           deliberately not offered: technology is imputed from output
+           per worker and the capital-output ratio, so regressing output
+           growth on those two is an identity.
+        5. hc (default='HC1'): See ols.
+
+    Returns a DataFrame with one row per specification and term.
+
+    """
+    if kind not in regression_terms:
+        raise ValueError("kind must be 'beta' or 'technology'!")
+    specs, i0, i1, mask = _specifications(data, groups, starts, windows)
+    if not specs:
+        raise ValueError('No specifications with data for both years!')
+
+    lny = np.log(data.values['realGDP'] / data.values['laborForce'])
+    T = np.array([window for _, _, window in specs],
+                 dtype=np.float64)[:, np.newaxis]
+
+    def growth(x):
+        return (x[i1] - x[i0]) / T
+
+    # (specifications x countries) design, built by indexing
+    if kind == 'beta':
+        y = growth(lny)
+    else:
+        y = growth(np.log(data.values['technology']))
+    X = np.stack([np.ones_like(y), lny[i0]], axis=-1)
+
+    results = ols(X, y, mask, hc)
+
+    terms = ('const',) + regression_terms[kind]
+    rows = []
+    for s, (name, start, window) in enumerate(specs):
+        for k, term in enumerate(terms):
+            rows.append((name, start, window, term, results.coef[s, k],
+                         results.se[s, k], results.nobs[s], results.r2[s]))
+    table = pd.DataFrame(rows, columns=['group', 'start', 'window', 'term',
+                                        'coef', 'se', 'nobs', 'r2'])
+    table['t'] = table['coef'] / table['se']
+    return table
@@ -0,0 +1,171 @@
+"""Real-time (vintage) store of revised series, e.g., GDP from FRED.
+
+Every version of a series that is recorded is kept, so that a figure can
+be reproduced exactly as it looked on a past date. Most vintages are
+stored as deltas against the previous vintage (the observations that were
+added, revised or removed), with a full snapshot every so often so that
+rebuilding any vintage only applies a handful of deltas. An index of the
+vintage times (index.json) finds the vintage in force on any date by
+binary search.
+
+"""
+import json
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+def _days(index):
+    """Dates as int32 day numbers (days since 1970-01-01)."""
+    return np.asarray(index.values, dtype='datetime64[D]').astype(np.int32)
+
+def _same(a, b):
+    """Element-wise equality that treats NaNs as equal."""
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+def delta(old, new):
+    """Delta from vintage old to vintage new, each a (days, values) pair
+    of sorted arrays. Returns (days, values, removed): the observations
+    that are new or revised, and the days that disappeared.
+
+    """
+    old_days, old_values = old
+    new_days, new_values = new
+
+    if old_days.size == 0:
+        return new_days, new_values, old_days
+
+    pos = np.minimum(np.searchsorted(old_days, new_days), old_days.size - 1)
+    unchanged = (old_days[pos] == new_days) & \
+                _same(old_values[pos], new_values)
+
+    removed = old_days[~np.in1d(old_days, new_days)]
+    return new_days[~unchanged], new_values[~unchanged], removed
+
+def apply_delta(old, days, values, removed):
+    """Vintage (days, values) after applying a delta to vintage old."""
+    old_days, old_values = old
+    keep = ~np.in1d(old_days, np.concatenate([days, removed]))
+    all_days = np.concatenate([old_days[keep], days])
+    all_values = np.concatenate([old_values[keep], values])
+    order = np.argsort(all_days, kind='mergesort')
+    return all_days[order], all_values[order]
+
+class VintageStore(object):
+    """Directory of series vintages."""
+
+    def __init__(self, root, snapshot_every=10):
+        """Required arguments:
+
+            1. root: Directory of the store. Created if it does not
+               exist.
+
+        Optional arguments:
+
+            1. snapshot_every (default=10): Store a full copy of every
+               snapshot_every-th vintage (the others are deltas).
+
+        """
+        self.root = root
+        self.snapshot_every = snapshot_every
+        self._memo = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, name):
+        return os.path.join(self.root, re.sub(r'[^A-Za-z0-9_.-]', '_', name))
+
+    def index(self, name):
+        """Index of the vintages of series name: times (seconds since the
+        epoch) at which each vintage was recorded, and which vintages are
+        full snapshots.
+
+        """
+        path = os.path.join(self._dir(name), 'index.json')
+        if not os.path.isfile(path):
+            return {'times': [], 'snapshots': []}
+        with open(path) as f:
+            return json.load(f)
+
+    def vintages(self, name):
+        """Dates on which the vintages of series name were recorded."""
+        return pd.to_datetime(self.index(name)['times'], unit='s')
+
+    def _load(self, name, k):
+        """Vintage k of series name as a (days, values) pair."""
+        if (name, k) in self._memo:
+            return self._memo[(name, k)]
+
+        snapshots = self.index(name)['snapshots']
+        start = max(s for s in snapshots if s <= k)
+        with np.load(os.path.join(self._dir(name), '%06d.npz' % start)) as f:
+            state = (f['days'], f['values'])
+        for j in range(start + 1, k + 1):
+            with np.load(os.path.join(self._dir(name), '%06d.npz' % j)) as f:
+                state = apply_delta(state, f['days'], f['values'],
+                                    f['removed'])
+
+        self._memo[(name, k)] = state
+        return state
+
+    def record(self, name, data, when=None):
+        """Records data (a Series or single column DataFrame indexed by
+        date) as the latest vintage of series name, recorded at time when
+        (seconds since the epoch, default now). Nothing is written if data
+        is the same as the latest vintage.
+
+        Returns True if a new vintage was recorded.
+
+        """
+        if isinstance(data, pd.DataFrame):
+            data = data[data.columns[0]]
+        data = data.sort_index()
+        new = (_days(data.index), data.values.astype(np.float64))
+        when = time.time() if when is None else when
+
+        meta = self.index(name)
+        k = len(meta['times'])
+        directory = self._dir(name)
+        os.makedirs(directory, exist_ok=True)
+
+        if k > 0:
+            days, values, removed = delta(self._load(name, k - 1), new)
+            if days.size == 0 and removed.size == 0:
+                return False
+        path = os.path.join(directory, '%06d.npz' % k)
+        if k % self.snapshot_every == 0:
+            np.savez(path, days=new[0], values=new[1])
+            meta['snapshots'].append(k)
+        else:
+            np.savez(path, days=days, values=values, removed=removed)
+        meta['times'].append(when)
+
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(meta, f, indent=2)
+        index_path = os.path.join(directory, 'index.json')
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        os.rename(tmp_path, index_path)
+
+        self._memo[(name, k)] = new
+        return True
+
+    def as_of(self, name, date):
+        """Series name as it was known at the end of date (i.e., the last
+        vintage recorded on or before date) as a DataFrame indexed by
+        DATE.
+
+        """
+        times = np.asarray(self.index(name)['times'])
+        end = (pd.Timestamp(date).normalize() + pd.Timedelta(days=1) -
+               pd.Timestamp(0)).total_seconds()
+        k = np.searchsorted(times, end, side='left') - 1
+        if k < 0:
+            raise KeyError('No vintage of %s as of %s!' % (name, date))
+
+        days, values = self._load(name, int(k))
+        index = pd.DatetimeIndex(days.astype('datetime64[D]'), name='DATE')
+        return pd.DataFrame({name: values}, index=index)